@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import StockReservation
 
-# Register your models here.
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'owner', 'product', 'quantity', 'expires_at')
+    search_fields = ('owner',)
+    raw_id_fields = ('product',)
+    ordering = ('expires_at',)
@@ -4,6 +4,9 @@ from products.models import Product
 
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
+    # Bumped by every change; `total` is kept as a running sum by the cart store.
+    version = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -17,6 +20,8 @@ class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # Price the line was last valued at, so Cart.total can move by deltas.
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
     class Meta:
         unique_together = ('cart', 'product')
@@ -25,4 +30,21 @@ class CartItem(models.Model):
         return f"{self.product.title} - {self.quantity}"
 
     def get_item_total(self):
-        return self.product.price * self.quantity
\ No newline at end of file
+        return self.product.price * self.quantity
+
+class StockReservation(models.Model):
+    # 'user:<id>' or 'anonymous:<cart token>'
+    owner = models.CharField(max_length=64)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('owner', 'product')
+        indexes = [
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+            models.Index(fields=['product', 'expires_at'], name='reservation_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner}: {self.quantity} x {self.product_id}"
@@ -0,0 +1,159 @@
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, IntegerField, Q, Value, When
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from core.cache import bump_generation_on_commit
+from products.models import Product
+from .models import StockReservation
+
+
+def get_owner_key(owner):
+    if isinstance(owner, str):
+        return f'anonymous:{owner}'
+    return f'user:{owner.pk}'
+
+
+def get_ttl():
+    return getattr(settings, 'CART_RESERVATION_TTL', 15 * 60)
+
+
+def move_reserved(delta, now):
+    """
+    UPDATE values moving `reserved` by `delta`. The catalog only sees
+    reservations through `?available=`, so updated_at moves to `now` just for
+    products going out of or back into stock; other holds leave catalog
+    caches and validators alone.
+    """
+    before = Q(stock__gt=F('reserved'))
+    after = Q(stock__gt=F('reserved') + delta)
+    return {
+        # First, so MySQL (which assigns left to right) compares the old `reserved`.
+        'updated_at': Case(
+            When((before & ~after) | (~before & after), then=Value(now)),
+            default=F('updated_at'),
+            output_field=DateTimeField(),
+        ),
+        'reserved': F('reserved') + delta,
+    }
+
+
+def expire_catalog(product_ids, now):
+    """Drop cached catalog pages once the transaction commits if any of the products changed availability."""
+    if Product.objects.filter(pk__in=product_ids, updated_at=now).exists():
+        bump_generation_on_commit('products.Product')
+
+
+def reserve_units(product_id, quantity, now):
+    """Conditional UPDATE: take `quantity` more units only if they are not already held."""
+    return Product.objects.filter(pk=product_id, stock__gte=F('reserved') + quantity).update(
+        **move_reserved(quantity, now)
+    )
+
+
+@transaction.atomic
+def hold(owner, quantities, clamp=False):
+    """
+    Make the owner's reservations match `quantities` ({product_id: units},
+    0 releases) and push every reservation of the owner TTL seconds out.
+    At most CART_RESERVATION_MAX_QUANTITY units of a product are held per
+    owner, and anonymous carts hold nothing: anyone can mint cart tokens, so
+    their lines are only held once merged into a user's cart at login.
+    Raises ValidationError if stock runs short, or with `clamp` cuts the
+    quantity down to what could be held instead. Returns the quantities.
+    """
+    if not get_ttl() or not quantities or isinstance(owner, str):
+        return dict(quantities)
+
+    key = get_owner_key(owner)
+    cap = getattr(settings, 'CART_RESERVATION_MAX_QUANTITY', None)
+    release_expired(product_ids=list(quantities))
+    held = dict(
+        StockReservation.objects.select_for_update()
+        .filter(owner=key, product_id__in=quantities)
+        .values_list('product_id', 'quantity')
+    )
+
+    now = timezone.now()
+    result, reserved = {}, {}
+    # A fixed order keeps concurrent holds from locking products in opposite orders.
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        target = min(quantity, cap) if cap else quantity
+        delta = target - held.get(product_id, 0)
+        if delta < 0:
+            Product.objects.filter(pk=product_id).update(**move_reserved(delta, now))
+        elif delta > 0 and not reserve_units(product_id, delta, now):
+            product = Product.objects.only('stock', 'reserved').get(pk=product_id)
+            if not clamp:
+                available = product.available_stock + held.get(product_id, 0)
+                raise ValidationError(f'Only {available} item(s) left in stock.')
+            extra = product.available_stock
+            if extra and not reserve_units(product_id, extra, now):
+                extra = 0
+            target = quantity = held.get(product_id, 0) + extra
+        reserved[product_id] = target
+        result[product_id] = quantity
+    expire_catalog(reserved, now)
+
+    expires_at = now + timedelta(seconds=get_ttl())
+    StockReservation.objects.filter(owner=key, product_id__in=[
+        product_id for product_id, quantity in reserved.items() if not quantity
+    ]).delete()
+    StockReservation.objects.bulk_create(
+        [StockReservation(owner=key, product_id=product_id, quantity=quantity, expires_at=expires_at)
+         for product_id, quantity in reserved.items() if quantity],
+        update_conflicts=True,
+        unique_fields=['owner', 'product'],
+        update_fields=['quantity', 'expires_at'],
+    )
+    StockReservation.objects.filter(owner=key).update(expires_at=expires_at)
+    return result
+
+
+def release(owner):
+    """Give back everything the owner holds."""
+    product_ids = StockReservation.objects.filter(owner=get_owner_key(owner)).values_list('product_id', flat=True)
+    return hold(owner, dict.fromkeys(product_ids, 0))
+
+
+@transaction.atomic
+def consume(owner, quantities):
+    """
+    At checkout: make sure the owner still holds `quantities`, re-reserving
+    what expired, then drop the holds. The caller decreases the stock in the
+    same transaction.
+    """
+    hold(owner, quantities)
+    release(owner)
+
+
+def release_expired(batch_size=None, product_ids=None):
+    """
+    Delete expired reservations in batches and give their units back with
+    one UPDATE per batch. Returns the number of reservations released.
+    """
+    batch_size = batch_size or getattr(settings, 'CART_RESERVATION_SWEEP_BATCH', 500)
+    now = timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            expired = StockReservation.objects.select_for_update().filter(expires_at__lte=now)
+            if product_ids is not None:
+                expired = expired.filter(product_id__in=product_ids)
+            rows = list(expired.order_by('expires_at').values_list('id', 'product_id', 'quantity')[:batch_size])
+            if not rows:
+                return released
+
+            totals = Counter()
+            for _, product_id, quantity in rows:
+                totals[product_id] += quantity
+            StockReservation.objects.filter(id__in=[row[0] for row in rows]).delete()
+            Product.objects.filter(pk__in=totals).update(**move_reserved(-Case(
+                *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in totals.items()],
+                output_field=IntegerField(),
+            ), now))
+            expire_catalog(totals, now)
+            released += len(rows)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Cart, CartItem
 from products.models import Product
+from core.fieldsets import SparseFieldsetMixin
 
 class AddToCartSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
@@ -9,12 +10,31 @@ class AddToCartSerializer(serializers.Serializer):
 class CartItemUpdateSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(min_value=0)
 
-class CartItemProductSerializer(serializers.ModelSerializer):
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        if attrs['op'] == 'add':
+            attrs.setdefault('quantity', 1)
+            if attrs['quantity'] < 1:
+                raise serializers.ValidationError({'quantity': 'Ensure this value is greater than or equal to 1.'})
+        elif attrs['op'] == 'set' and 'quantity' not in attrs:
+            raise serializers.ValidationError({'quantity': 'This field is required.'})
+        return attrs
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = serializers.ListField(child=CartOperationSerializer(), allow_empty=False, max_length=100)
+
+class CartItemProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = ['id', 'title', 'price']
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # Lines are addressed by product id, whichever store holds the cart.
+    id = serializers.IntegerField(source='product_id', read_only=True)
     product = CartItemProductSerializer(read_only=True)
     item_total = serializers.SerializerMethodField()
 
@@ -23,16 +43,27 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'quantity', 'item_total']
 
     def get_item_total(self, obj) -> float:
+        # Annotated by services.get_cart_detail; computed in Python otherwise.
+        if hasattr(obj, 'item_total'):
+            return obj.item_total
         return obj.get_item_total()
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     cart_total = serializers.SerializerMethodField()
     user = serializers.CharField(source='user.username', read_only=True)
 
     class Meta:
         model = Cart
-        fields = ['id', 'user', 'items', 'cart_total']
+        fields = ['id', 'user', 'version', 'items', 'cart_total']
 
     def get_cart_total(self, obj) -> float:
-        return obj.get_cart_total()
\ No newline at end of file
+        if hasattr(obj, 'cart_total'):
+            return obj.cart_total
+        return obj.get_cart_total()
+
+class CartDeltaSerializer(serializers.Serializer):
+    version = serializers.IntegerField()
+    cart_total = serializers.FloatField()
+    changed = CartItemSerializer(many=True)
+    removed = serializers.ListField(child=serializers.IntegerField())
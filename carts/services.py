@@ -1,72 +1,64 @@
-from django.db import transaction
-from rest_framework.exceptions import NotFound
-from products.services import check_product_stock, get_product_or_404
-from .models import Cart, CartItem
-
-
-def get_cart_or_create(user):
-    cart, _ = Cart.objects.get_or_create(user=user)
-    return cart
-
-
-@transaction.atomic
-def add_product_to_cart(user, product_id, quantity):
-    product = get_product_or_404(product_id)
-    check_product_stock(product, quantity)
-
-    cart = get_cart_or_create(user)
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        product=product
-    )
-
-    if created:
-        cart_item.quantity = quantity
-    else:
-        new_quantity = cart_item.quantity + quantity
-        check_product_stock(product, new_quantity)
-        cart_item.quantity = new_quantity
-
-    cart_item.save()
-    return cart
-
-
-@transaction.atomic
-def update_cart_item(user, cart_item_id, quantity):
-    try:
-        cart_item = CartItem.objects.get(
-            pk=cart_item_id,
-            cart__user=user
-        )
-    except CartItem.DoesNotExist:
-        raise NotFound("Cart item not found")
-
-    if quantity <= 0:
-        cart_item.delete()
-    else:
-        check_product_stock(cart_item.product, quantity)
-        cart_item.quantity = quantity
-        cart_item.save()
-
-    return cart_item.cart
-
-
-@transaction.atomic
-def delete_cart_item(user, cart_item_id):
-    try:
-        cart_item = CartItem.objects.get(
-            pk=cart_item_id,
-            cart__user=user
-        )
-    except CartItem.DoesNotExist:
-        raise NotFound("Cart item not found")
-
-    cart_item.delete()
-    return cart_item.cart
-
-
-@transaction.atomic
-def clear_cart(user):
-    cart = get_cart_or_create(user)
-    cart.items.all().delete()
-    return cart
\ No newline at end of file
+import re
+import uuid
+from .storage import StoredCart, get_anonymous_store, get_store_for
+
+CART_TOKEN_HEADER = 'X-Cart-Token'
+CART_TOKEN_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def parse_cart_token(value):
+    return value if value and CART_TOKEN_RE.match(value) else None
+
+
+def get_cart_owner(request, create=False):
+    """
+    The user for authenticated requests; otherwise the anonymous cart token
+    sent in X-Cart-Token, a new one when `create`, or None.
+    """
+    if request.user and request.user.is_authenticated:
+        return request.user
+    token = parse_cart_token(request.headers.get(CART_TOKEN_HEADER))
+    if token is None and create:
+        token = uuid.uuid4().hex
+    return token
+
+
+def get_cart_detail(owner, with_items=True):
+    if owner is None:
+        return StoredCart(None, None, [])
+    return get_store_for(owner).get_cart(owner, with_items=with_items)
+
+
+def add_product_to_cart(owner, product_id, quantity):
+    return get_store_for(owner).add(owner, product_id, quantity)
+
+
+def update_cart_item(owner, line_id, quantity):
+    return get_store_for(owner).update(owner, line_id, quantity)
+
+
+def delete_cart_item(owner, line_id):
+    return get_store_for(owner).remove(owner, line_id)
+
+
+def clear_cart(owner):
+    return get_store_for(owner).clear(owner)
+
+
+def apply_cart_operations(owner, operations):
+    return get_store_for(owner).apply_batch(owner, operations)
+
+
+def merge_anonymous_cart(token, user):
+    """Move an anonymous cart into the user's cart, e.g. at login."""
+    token = parse_cart_token(token)
+    if token is None:
+        return
+    lines = get_anonymous_store().pop_lines(token)
+    if lines:
+        get_store_for(user).merge_lines(user, lines)
+
+
+def checkout_cart(user):
+    """Context manager yielding a consistent, persisted snapshot of the user's Cart."""
+    return get_store_for(user).checkout(user)
@@ -0,0 +1,647 @@
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from products.models import Product
+from products.services import check_product_stock, get_product_or_404
+from . import reservations
+from .models import Cart, CartItem
+
+logger = logging.getLogger(__name__)
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+_backend = None
+_anonymous_store = None
+_executor = None
+
+
+class CartBusy(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The cart is being changed by another request. Retry shortly.'
+    default_code = 'cart_busy'
+
+
+def get_cart_or_create(user):
+    cart, _ = Cart.objects.get_or_create(user=user)
+    return cart
+
+
+def merged_quantities(current, lines, products):
+    """Quantities after adding `lines` to `current`, capped at the stock left."""
+    merged = {}
+    for product_id, quantity in lines.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        quantity = min(current.get(product_id, 0) + quantity, product.stock)
+        if quantity > 0:
+            merged[product_id] = quantity
+    return merged
+
+
+def apply_operations(current, operations, products):
+    """
+    {product_id: quantity} after applying batch `operations` in order, with
+    the same rules as single adds and updates. Errors are keyed by the
+    operation's index, like ListField errors.
+    """
+    lines = dict(current)
+    for index, operation in enumerate(operations):
+        product_id, quantity = operation['product_id'], operation.get('quantity')
+        product = products.get(product_id)
+        try:
+            if product is None:
+                raise ValidationError(f'Product with id {product_id} was not found.')
+            if operation['op'] == 'add':
+                check_product_stock(product, quantity)
+                check_product_stock(product, lines.get(product_id, 0) + quantity)
+                lines[product_id] = lines.get(product_id, 0) + quantity
+            elif operation['op'] == 'set' and quantity > 0:
+                check_product_stock(product, quantity)
+                lines[product_id] = quantity
+            elif operation['op'] == 'set':
+                lines.pop(product_id, None)
+            elif product_id not in lines:
+                raise ValidationError('Cart item not found')
+            else:
+                del lines[product_id]
+        except ValidationError as exc:
+            raise ValidationError({'operations': {index: exc.detail}})
+    return lines
+
+
+def changed_quantities(old, new):
+    """{product_id: new quantity} for lines that differ, 0 for removed ones."""
+    return {
+        product_id: new.get(product_id, 0)
+        for product_id in old.keys() | new.keys()
+        if old.get(product_id, 0) != new.get(product_id, 0)
+    }
+
+
+def line_value(item):
+    """What a saved line added to the running total."""
+    price = item.price if item.price is not None else item.product.price
+    return price * item.quantity
+
+
+def priced(product, quantity):
+    item = CartItem(product=product, quantity=quantity)
+    item.item_total = product.price * quantity
+    return item
+
+
+class StoredCart:
+    """A cart held outside the database, shaped like Cart for CartSerializer."""
+
+    def __init__(self, id, user, items, version=0):
+        self.id = id
+        self.user = user
+        self.items = items
+        self.version = version
+        self.cart_total = sum((item.item_total for item in items), Decimal('0'))
+
+
+class CartDelta:
+    """What one mutation changed: the new version and total, changed lines and removed line ids."""
+
+    def __init__(self, version, cart_total, changed=(), removed=()):
+        self.version = version
+        self.cart_total = cart_total
+        self.changed = list(changed)
+        self.removed = list(removed)
+
+
+class BaseCartStore:
+    """
+    Where active carts live. Owners are users, or anonymous cart tokens
+    (strings) for the anonymous store. Line ids are product ids whichever
+    backend holds the cart, so a client's ids survive a backend switch and the
+    flush from cache to database.
+
+    Mutations return a CartDelta. Every mutation bumps the cart's version,
+    and the running total moves by the amount the change is worth, at the
+    prices the lines were priced at. Full reads re-price and re-base it,
+    bumping the version too when that changed the total.
+    """
+
+    def get_cart(self, owner, with_items=True):
+        raise NotImplementedError
+
+    def add(self, owner, product_id, quantity):
+        raise NotImplementedError
+
+    def update(self, owner, line_id, quantity):
+        raise NotImplementedError
+
+    def remove(self, owner, line_id):
+        raise NotImplementedError
+
+    def clear(self, owner):
+        raise NotImplementedError
+
+    def get_lines(self, owner):
+        """{product_id: quantity} in the order the products were added."""
+        raise NotImplementedError
+
+    def merge_lines(self, user, lines):
+        raise NotImplementedError
+
+    def apply_batch(self, owner, operations):
+        """Apply add/set/remove operations all-or-nothing, checking products in one query."""
+        raise NotImplementedError
+
+    def flush(self, user):
+        """Write any pending state to Cart/CartItem."""
+
+    def checkout(self, user):
+        """
+        Context manager yielding the user's Cart with its items persisted and
+        no other write to the cart in between; the caller empties it.
+        """
+        raise NotImplementedError
+
+
+class DatabaseCartStore(BaseCartStore):
+    """Every call reads and writes Cart/CartItem directly."""
+
+    def get_cart(self, owner, with_items=True):
+        """
+        Cart for serialization: line totals and the cart total are computed by
+        the database, and items with their products come from one prefetch.
+        """
+        queryset = Cart.objects.filter(user=owner).select_related('user').annotate(
+            cart_total=Coalesce(
+                Sum(F('items__quantity') * F('items__product__price'), output_field=MONEY),
+                Decimal('0'),
+                output_field=MONEY,
+            )
+        )
+        if with_items:
+            items = CartItem.objects.select_related('product').annotate(
+                item_total=ExpressionWrapper(F('quantity') * F('product__price'), output_field=MONEY)
+            ).order_by('id')
+            queryset = queryset.prefetch_related(Prefetch('items', queryset=items))
+
+        cart = queryset.first()
+        if cart is None:
+            cart = get_cart_or_create(owner)
+            cart.cart_total = Decimal('0')
+        elif cart.total != cart.cart_total:
+            self.rebase(cart)
+        return cart
+
+    @transaction.atomic
+    def rebase(self, cart):
+        """
+        Prices moved since the running total was kept: re-price the lines,
+        unless another write got in first. The total changed, so the version
+        moves too and delta clients know to re-read.
+        """
+        updated = Cart.objects.filter(pk=cart.pk, version=cart.version).update(
+            total=cart.cart_total, version=F('version') + 1
+        )
+        if updated:
+            cart.items.update(price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')))
+            cart.total = cart.cart_total
+            cart.version += 1
+
+    def lock_cart(self, owner):
+        """The owner's cart, row-locked for the transaction on databases that support it."""
+        cart, _ = Cart.objects.select_for_update().get_or_create(user=owner)
+        return cart
+
+    def record(self, cart, amount, changed=(), removed=(), total=None):
+        cart.version += 1
+        cart.total = cart.total + amount if total is None else total
+        cart.save(update_fields=['version', 'total', 'updated_at'])
+        return CartDelta(cart.version, cart.total, changed, removed)
+
+    @transaction.atomic
+    def add(self, owner, product_id, quantity):
+        product = get_product_or_404(product_id)
+        check_product_stock(product, quantity)
+
+        cart = self.lock_cart(owner)
+        cart_item, created = CartItem.objects.get_or_create(
+            cart=cart,
+            product=product
+        )
+
+        old_value = Decimal('0') if created else line_value(cart_item)
+        if created:
+            cart_item.quantity = quantity
+        else:
+            new_quantity = cart_item.quantity + quantity
+            check_product_stock(product, new_quantity)
+            cart_item.quantity = new_quantity
+
+        reservations.hold(owner, {product.pk: cart_item.quantity})
+        cart_item.price = product.price
+        cart_item.save()
+        return self.record(
+            cart, line_value(cart_item) - old_value,
+            changed=[priced(product, cart_item.quantity)],
+        )
+
+    def get_item(self, cart, line_id):
+        try:
+            return cart.items.select_related('product').get(product_id=line_id)
+        except CartItem.DoesNotExist:
+            raise NotFound("Cart item not found")
+
+    @transaction.atomic
+    def update(self, owner, line_id, quantity):
+        cart = self.lock_cart(owner)
+        cart_item = self.get_item(cart, line_id)
+        product = cart_item.product
+        if quantity <= 0:
+            return self.delete_item(owner, cart, cart_item)
+
+        check_product_stock(product, quantity)
+        reservations.hold(owner, {product.pk: quantity})
+        old_value = line_value(cart_item)
+        cart_item.quantity = quantity
+        cart_item.price = product.price
+        cart_item.save()
+        return self.record(cart, line_value(cart_item) - old_value, changed=[priced(product, quantity)])
+
+    @transaction.atomic
+    def remove(self, owner, line_id):
+        cart = self.lock_cart(owner)
+        return self.delete_item(owner, cart, self.get_item(cart, line_id))
+
+    def delete_item(self, owner, cart, cart_item):
+        reservations.hold(owner, {cart_item.product_id: 0})
+        cart_item.delete()
+        return self.record(cart, -line_value(cart_item), removed=[cart_item.product_id])
+
+    @transaction.atomic
+    def clear(self, owner):
+        cart = self.lock_cart(owner)
+        reservations.release(owner)
+        removed = list(cart.items.values_list('product_id', flat=True))
+        cart.items.all().delete()
+        return self.record(cart, 0, removed=removed, total=Decimal('0'))
+
+    def get_lines(self, owner):
+        return dict(
+            CartItem.objects.filter(cart__user=owner).order_by('id').values_list('product_id', 'quantity')
+        )
+
+    @transaction.atomic
+    def merge_lines(self, user, lines):
+        cart = self.lock_cart(user)
+        products = Product.objects.in_bulk(lines)
+        items = {item.product_id: item for item in cart.items.select_related('product')}
+        current = {product_id: item.quantity for product_id, item in items.items()}
+        merged = merged_quantities(current, lines, products)
+        merged = {
+            product_id: quantity
+            for product_id, quantity in reservations.hold(user, merged, clamp=True).items() if quantity
+        }
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, product_id=product_id, quantity=quantity, price=products[product_id].price)
+             for product_id, quantity in merged.items()],
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['quantity', 'price'],
+        )
+        amount = sum(
+            (products[product_id].price * quantity - (line_value(items[product_id]) if product_id in items else 0)
+             for product_id, quantity in merged.items()),
+            Decimal('0'),
+        )
+        # Upserted rows don't get their ids back everywhere, so no lines here.
+        return self.record(cart, amount)
+
+    @transaction.atomic
+    def apply_batch(self, owner, operations):
+        products = Product.objects.in_bulk({operation['product_id'] for operation in operations})
+        cart = self.lock_cart(owner)
+        items = {item.product_id: item for item in cart.items.select_related('product')}
+        current = {product_id: item.quantity for product_id, item in items.items()}
+        lines = apply_operations(current, operations, products)
+        changes = changed_quantities(current, lines)
+        reservations.hold(owner, changes)
+
+        amount = Decimal('0')
+        removed, updated = [], []
+        for product_id, quantity in changes.items():
+            amount += products[product_id].price * quantity
+            if product_id not in items:
+                continue
+            amount -= line_value(items[product_id])
+            if quantity:
+                items[product_id].quantity = quantity
+                items[product_id].price = products[product_id].price
+                updated.append(items[product_id])
+            else:
+                removed.append(product_id)
+
+        if removed:
+            cart.items.filter(product_id__in=removed).delete()
+        if updated:
+            CartItem.objects.bulk_update(updated, ['quantity', 'price'])
+        created = CartItem.objects.bulk_create([
+            CartItem(cart=cart, product_id=product_id, quantity=quantity, price=products[product_id].price)
+            for product_id, quantity in lines.items() if product_id not in items
+        ])
+
+        return self.record(cart, amount, removed=removed, changed=[
+            priced(products[item.product_id], item.quantity) for item in updated + created
+        ])
+
+    @contextmanager
+    def checkout(self, user):
+        with transaction.atomic():
+            yield self.lock_cart(user)
+
+
+class CacheCartStore(BaseCartStore):
+    """
+    Keeps each active cart in Django's cache as {product_id: quantity} and
+    writes it behind to Cart/CartItem on a worker thread; checkout flushes
+    first. Read-modify-writes of one cart are serialized by a cache lock, so
+    the cache must be shared between processes (e.g. Redis or Memcached)
+    when running more than one. A request that can't get the lock within
+    CART_LOCK_WAIT seconds gets a 409 rather than queueing behind it.
+    """
+
+    def __init__(self, write_behind=True):
+        self.cache = caches[getattr(settings, 'CART_CACHE_ALIAS', 'default')]
+        self.timeout = getattr(settings, 'CART_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+        self.lock_timeout = getattr(settings, 'CART_LOCK_TIMEOUT', 10)
+        self.lock_wait = getattr(settings, 'CART_LOCK_WAIT', 5)
+        self.write_behind = write_behind
+
+    def get_key(self, owner):
+        if isinstance(owner, str):
+            return f'cart:anonymous:{owner}'
+        return f'cart:user:{owner.pk}'
+
+    @contextmanager
+    def lock(self, owner):
+        # cache.add() is atomic; the timeout frees locks left by a dead worker.
+        key = f'{self.get_key(owner)}:lock'
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_wait
+        while not self.cache.add(key, token, self.lock_timeout):
+            if time.monotonic() >= deadline:
+                raise CartBusy()
+            time.sleep(0.005)
+        try:
+            yield
+        finally:
+            if self.cache.get(key) == token:
+                self.cache.delete(key)
+
+    def load(self, owner):
+        state = self.cache.get(self.get_key(owner))
+        if state is not None:
+            return state
+
+        # `prices` are what each line was priced at, for the running total.
+        state = {'cart_id': None, 'version': 0, 'total': Decimal('0'), 'dirty': False, 'lines': {}, 'prices': {}}
+        if not isinstance(owner, str):
+            rows = Cart.objects.filter(user=owner).order_by('items__id').values_list(
+                'id', 'version', 'total', 'items__product_id', 'items__quantity', 'items__price'
+            )
+            for cart_id, version, total, product_id, quantity, price in rows:
+                state['cart_id'], state['version'], state['total'] = cart_id, version, total
+                if product_id is not None:
+                    state['lines'][product_id] = quantity
+                if price is not None:
+                    state['prices'][product_id] = price
+        self.cache.set(self.get_key(owner), state, self.timeout)
+        return state
+
+    def save(self, owner, state):
+        state['version'] += 1
+        state['dirty'] = True
+        self.cache.set(self.get_key(owner), state, self.timeout)
+        if self.write_behind and not isinstance(owner, str):
+            if getattr(settings, 'CART_FLUSH_WORKERS', 1):
+                self.schedule_flush(owner.pk)
+            else:
+                # No workers: write through while we still hold the lock.
+                self.write_pending(owner)
+
+    def commit(self, owner, state, lines, products):
+        """Store the new lines, moving the running total by what changed."""
+        prices = state['prices']
+        changes = changed_quantities(state['lines'], lines)
+        for product_id, quantity in changes.items():
+            if product_id in products:
+                # Lines that are only removed keep the price they were added at.
+                old_price = prices.get(product_id, products[product_id].price)
+                state['total'] -= old_price * state['lines'].get(product_id, 0)
+                state['total'] += products[product_id].price * quantity
+            else:
+                state['total'] -= prices.get(product_id, Decimal('0')) * state['lines'].get(product_id, 0)
+            if quantity:
+                prices[product_id] = products[product_id].price
+            else:
+                prices.pop(product_id, None)
+
+        state['lines'] = lines
+        self.save(owner, state)
+        return CartDelta(
+            state['version'], state['total'],
+            changed=[
+                priced(products[product_id], quantity)
+                for product_id, quantity in changes.items() if quantity
+            ],
+            removed=[product_id for product_id, quantity in changes.items() if not quantity],
+        )
+
+    def get_cart(self, owner, with_items=True):
+        state = self.load(owner)
+        products = Product.objects.only('id', 'title', 'price').in_bulk(state['lines'])
+        items = [
+            priced(products[product_id], quantity)
+            for product_id, quantity in state['lines'].items() if product_id in products
+        ]
+        user = None if isinstance(owner, str) else owner
+        cart = StoredCart(state['cart_id'], user, items, state['version'])
+
+        if cart.cart_total != state['total']:
+            with self.lock(owner):
+                current = self.load(owner)
+                if current['version'] == state['version']:
+                    current['total'] = cart.cart_total
+                    current['prices'] = {item.product.pk: item.product.price for item in items}
+                    self.save(owner, current)
+                    cart.version = current['version']
+        return cart
+
+    def add(self, owner, product_id, quantity):
+        product = get_product_or_404(product_id)
+        check_product_stock(product, quantity)
+
+        with self.lock(owner):
+            state = self.load(owner)
+            new_quantity = state['lines'].get(product.pk, 0) + quantity
+            check_product_stock(product, new_quantity)
+            reservations.hold(owner, {product.pk: new_quantity})
+            return self.commit(owner, state, {**state['lines'], product.pk: new_quantity}, {product.pk: product})
+
+    def update(self, owner, line_id, quantity):
+        with self.lock(owner):
+            state = self.load(owner)
+            if line_id not in state['lines']:
+                raise NotFound("Cart item not found")
+
+            lines = dict(state['lines'])
+            products = {}
+            if quantity <= 0:
+                reservations.hold(owner, {line_id: 0})
+                del lines[line_id]
+            else:
+                products[line_id] = get_product_or_404(line_id)
+                check_product_stock(products[line_id], quantity)
+                reservations.hold(owner, {line_id: quantity})
+                lines[line_id] = quantity
+            return self.commit(owner, state, lines, products)
+
+    def remove(self, owner, line_id):
+        with self.lock(owner):
+            state = self.load(owner)
+            if line_id not in state['lines']:
+                raise NotFound("Cart item not found")
+            reservations.hold(owner, {line_id: 0})
+            lines = {product_id: quantity for product_id, quantity in state['lines'].items() if product_id != line_id}
+            return self.commit(owner, state, lines, {})
+
+    def clear(self, owner):
+        with self.lock(owner):
+            state = self.load(owner)
+            reservations.release(owner)
+            return self.commit(owner, state, {}, {})
+
+    def get_lines(self, owner):
+        return dict(self.load(owner)['lines'])
+
+    def pop_lines(self, owner):
+        with self.lock(owner):
+            lines = self.get_lines(owner)
+            reservations.release(owner)
+            self.cache.delete(self.get_key(owner))
+        return lines
+
+    def merge_lines(self, user, lines):
+        products = Product.objects.in_bulk(lines)
+        with self.lock(user):
+            state = self.load(user)
+            merged = merged_quantities(state['lines'], lines, products)
+            held = reservations.hold(user, merged, clamp=True)
+            return self.commit(user, state, {
+                **state['lines'], **{product_id: quantity for product_id, quantity in held.items() if quantity}
+            }, products)
+
+    def apply_batch(self, owner, operations):
+        products = Product.objects.in_bulk({operation['product_id'] for operation in operations})
+        with self.lock(owner):
+            state = self.load(owner)
+            lines = apply_operations(state['lines'], operations, products)
+            reservations.hold(owner, changed_quantities(state['lines'], lines))
+            return self.commit(owner, state, lines, products)
+
+    def persist(self, user, state):
+        """Make Cart/CartItem match the cached lines."""
+        with transaction.atomic():
+            cart = get_cart_or_create(user)
+            # Products deleted since they were added have no row to point at.
+            existing = set(Product.objects.filter(pk__in=state['lines']).values_list('id', flat=True))
+            lines = {
+                product_id: quantity for product_id, quantity in state['lines'].items()
+                if product_id in existing
+            }
+            cart.items.exclude(product_id__in=lines).delete()
+            CartItem.objects.bulk_create(
+                [CartItem(cart=cart, product_id=product_id, quantity=quantity, price=state['prices'].get(product_id))
+                 for product_id, quantity in lines.items()],
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity', 'price'],
+            )
+            Cart.objects.filter(pk=cart.pk).update(version=state['version'], total=state['total'])
+        return cart
+
+    def write_pending(self, user):
+        """Flush under a lock the caller already holds."""
+        state = self.load(user)
+        if state['dirty'] or state['cart_id'] is None:
+            cart = self.persist(user, state)
+            state['cart_id'] = cart.pk
+            state['dirty'] = False
+            self.cache.set(self.get_key(user), state, self.timeout)
+        return state
+
+    def flush(self, user):
+        with self.lock(user):
+            self.write_pending(user)
+
+    def schedule_flush(self, user_id):
+        """Queue a flush unless one is already waiting for this cart."""
+        if self.cache.add(f'cart:user:{user_id}:flush', True, self.lock_timeout):
+            get_executor().submit(self.run_flush, user_id)
+
+    def run_flush(self, user_id):
+        try:
+            self.cache.delete(f'cart:user:{user_id}:flush')
+            self.flush(User(pk=user_id))
+        except Exception:
+            logger.exception(f"Cart flush failed for user {user_id}")
+        finally:
+            connections.close_all()
+
+    @contextmanager
+    def checkout(self, user):
+        with self.lock(user):
+            state = self.write_pending(user)
+            yield Cart.objects.get(pk=state['cart_id'])
+            # The order emptied the saved cart; reload it from there next time.
+            self.cache.delete(self.get_key(user))
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.CART_FLUSH_WORKERS,
+            thread_name_prefix='cart-flush',
+        )
+    return _executor
+
+
+def get_cart_store():
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'CART_STORAGE_BACKEND', 'carts.storage.DatabaseCartStore')
+        _backend = import_string(backend_path)()
+    return _backend
+
+
+def get_anonymous_store():
+    """Anonymous carts have no Cart row to flush to; they live in the cache only."""
+    global _anonymous_store
+    if _anonymous_store is None:
+        _anonymous_store = CacheCartStore(write_behind=False)
+    return _anonymous_store
+
+
+def get_store_for(owner):
+    return get_anonymous_store() if isinstance(owner, str) else get_cart_store()
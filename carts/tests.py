@@ -1,3 +1,268 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from categories.models import Category
+from orders.services import create_order_from_cart
+from products.models import Product
+from . import reservations, services, storage
+from .models import Cart, StockReservation
 
-# Create your tests here.
+ORDER_ADDRESS = {
+    'full_name': 'Test Shopper', 'email': 'shopper@example.com', 'phone_number': '5550000000',
+    'line1': '1 Test Street', 'city': 'Istanbul', 'district': 'Kadikoy', 'postal_code': '34710', 'country': 'TR',
+}
+
+
+# Throttle counters live in the cache; keep them out of the query counts.
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CartReadQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        self.products = Product.objects.bulk_create([
+            Product(title=f'Product {i}', slug=f'product-{i}', price=Decimal(10 + i), stock=10, category=category)
+            for i in range(20)
+        ])
+
+    def fill_cart(self, count):
+        for product in self.products[:count]:
+            services.add_product_to_cart(self.user, product.id, 1)
+
+    def test_cart_read_query_count_does_not_grow_with_items(self):
+        self.fill_cart(2)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/cart/')
+        self.assertEqual(len(response.data['items']), 2)
+
+        self.fill_cart(20)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/cart/')
+        self.assertEqual(len(response.data['items']), 20)
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', password='pw')
+        self.other = User.objects.create_user('other', password='pw')
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        self.product = Product.objects.create(
+            title='Running shoe', slug='running-shoe', price=Decimal('10.00'), stock=5, category=category
+        )
+
+    def reserved(self):
+        self.product.refresh_from_db()
+        return self.product.reserved
+
+    def test_hold_reserves_and_adjusts(self):
+        self.assertEqual(reservations.hold(self.user, {self.product.pk: 3}), {self.product.pk: 3})
+        self.assertEqual(self.reserved(), 3)
+        reservations.hold(self.user, {self.product.pk: 1})
+        self.assertEqual(self.reserved(), 1)
+        self.assertEqual(StockReservation.objects.get(owner=f'user:{self.user.pk}').quantity, 1)
+
+    def test_hold_beyond_available_stock(self):
+        reservations.hold(self.other, {self.product.pk: 4})
+        with self.assertRaises(ValidationError):
+            reservations.hold(self.user, {self.product.pk: 2})
+        self.assertEqual(self.reserved(), 4)
+        self.assertEqual(reservations.hold(self.user, {self.product.pk: 2}, clamp=True), {self.product.pk: 1})
+        self.assertEqual(self.reserved(), 5)
+
+    def test_release_returns_every_unit(self):
+        reservations.hold(self.user, {self.product.pk: 3})
+        reservations.release(self.user)
+        self.assertEqual(self.reserved(), 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_holds_are_released(self):
+        reservations.hold(self.user, {self.product.pk: 5})
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(reservations.release_expired(), 1)
+        self.assertEqual(self.reserved(), 0)
+
+    def test_availability_changes_expire_the_catalog(self):
+        def available_titles():
+            return [row['title'] for row in APIClient().get('/api/products/', {'available': 'true'}).data['results']]
+
+        self.assertEqual(available_titles(), ['Running shoe'])
+        updated_at = Product.objects.get(pk=self.product.pk).updated_at
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            reservations.hold(self.other, {self.product.pk: 4})
+        self.assertEqual(callbacks, [])
+        self.assertEqual(Product.objects.get(pk=self.product.pk).updated_at, updated_at)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reservations.hold(self.user, {self.product.pk: 1})
+        self.assertEqual(available_titles(), [])
+        self.assertGreater(Product.objects.get(pk=self.product.pk).updated_at, updated_at)
+
+        StockReservation.objects.filter(owner=f'user:{self.user.pk}').update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            reservations.release_expired()
+        self.assertEqual(available_titles(), ['Running shoe'])
+
+    def test_expired_holds_are_swept_before_holding(self):
+        reservations.hold(self.other, {self.product.pk: 5})
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        reservations.hold(self.user, {self.product.pk: 5})
+        self.assertEqual(self.reserved(), 5)
+        self.assertEqual(StockReservation.objects.get().owner, f'user:{self.user.pk}')
+
+    @override_settings(CART_RESERVATION_MAX_QUANTITY=2)
+    def test_hold_is_capped_per_owner_and_product(self):
+        self.assertEqual(reservations.hold(self.user, {self.product.pk: 4}), {self.product.pk: 4})
+        self.assertEqual(self.reserved(), 2)
+        reservations.hold(self.other, {self.product.pk: 3})
+        self.assertEqual(self.reserved(), 4)
+
+    def test_anonymous_carts_hold_nothing(self):
+        client = APIClient()
+        response = client.post('/api/cart/add/', {'product_id': self.product.pk, 'quantity': 5}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.reserved(), 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+        # Logging in merges the cart, and the user's lines are held from then on.
+        services.merge_anonymous_cart(response['X-Cart-Token'], self.user)
+        self.assertEqual(self.reserved(), 5)
+
+
+class DatabaseCartFlowTests(TestCase):
+    backend = 'carts.storage.DatabaseCartStore'
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(override_settings(CART_STORAGE_BACKEND=self.backend, CART_FLUSH_WORKERS=0))
+        self.enterContext(mock.patch.object(storage, '_backend', None))
+        self.user = User.objects.create_user('shopper', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        self.shoe, self.sock = Product.objects.bulk_create([
+            Product(title=title, slug=title.lower(), price=Decimal(price), stock=5, category=category)
+            for title, price in (('Shoe', '30.00'), ('Sock', '5.00'))
+        ])
+
+    def lines(self, response):
+        return {item['id']: item['quantity'] for item in response.data['items']}
+
+    def product_reserved(self, product, expected):
+        product.refresh_from_db()
+        self.assertEqual(product.reserved, expected)
+
+    def test_add_update_remove_and_checkout(self):
+        self.client.post('/api/cart/add/', {'product_id': self.shoe.pk}, format='json')
+        response = self.client.post('/api/cart/add/', {'product_id': self.sock.pk, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 201)
+        # Lines are addressed by product id, whichever store holds the cart.
+        self.assertEqual(self.lines(response), {self.shoe.pk: 1, self.sock.pk: 2})
+        self.assertEqual(response.data['cart_total'], Decimal('40.00'))
+
+        response = self.client.put(f'/api/cart/items/{self.shoe.pk}/update/', {'quantity': 3}, format='json')
+        self.assertEqual(self.lines(response), {self.shoe.pk: 3, self.sock.pk: 2})
+
+        response = self.client.delete(f'/api/cart/items/{self.sock.pk}/delete/?response=delta')
+        self.assertEqual(response.data['removed'], [self.sock.pk])
+        response = self.client.delete(f'/api/cart/items/{self.sock.pk}/delete/')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get('/api/cart/')
+        self.assertEqual(self.lines(response), {self.shoe.pk: 3})
+        self.assertEqual(response.data['cart_total'], Decimal('90.00'))
+
+        order = create_order_from_cart(self.user, ORDER_ADDRESS)
+        self.assertEqual(order.order_total, Decimal('90.00'))
+        self.assertEqual(list(order.items.values_list('product_id', 'quantity')), [(self.shoe.pk, 3)])
+        self.assertFalse(Cart.objects.get(user=self.user).items.exists())
+        self.assertEqual(self.lines(self.client.get('/api/cart/')), {})
+
+    def test_delta_ids_match_full_read(self):
+        response = self.client.post('/api/cart/add/?response=delta', {'product_id': self.shoe.pk}, format='json')
+        self.assertEqual([item['id'] for item in response.data['changed']], [self.shoe.pk])
+        response = self.client.delete('/api/cart/clear/?response=delta')
+        self.assertEqual(response.data['removed'], [self.shoe.pk])
+
+    def test_read_after_price_change_bumps_the_version(self):
+        response = self.client.post('/api/cart/add/?response=delta', {'product_id': self.shoe.pk}, format='json')
+        version = response.data['version']
+        self.assertEqual(self.client.get('/api/cart/').data['version'], version)
+
+        Product.objects.filter(pk=self.shoe.pk).update(price=Decimal('40.00'))
+        response = self.client.get('/api/cart/')
+        self.assertEqual(response.data['version'], version + 1)
+        self.assertEqual(response.data['cart_total'], Decimal('40.00'))
+        self.assertEqual(self.client.get('/api/cart/').data['version'], version + 1)
+
+        # Later deltas move the re-priced total.
+        response = self.client.post('/api/cart/add/?response=delta', {'product_id': self.sock.pk}, format='json')
+        self.assertEqual(response.data['version'], version + 2)
+        self.assertEqual(response.data['cart_total'], 45.0)
+        self.assertEqual(self.client.get('/api/cart/').data['version'], version + 2)
+
+    def test_batch_applies_every_operation(self):
+        self.client.post('/api/cart/add/', {'product_id': self.sock.pk}, format='json')
+        response = self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'add', 'product_id': self.shoe.pk, 'quantity': 2},
+            {'op': 'set', 'product_id': self.shoe.pk, 'quantity': 4},
+            {'op': 'remove', 'product_id': self.sock.pk},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.lines(response), {self.shoe.pk: 4})
+
+    def test_failed_batch_changes_nothing(self):
+        self.client.post('/api/cart/add/', {'product_id': self.sock.pk}, format='json')
+        before = self.client.get('/api/cart/').data
+        response = self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'add', 'product_id': self.shoe.pk},
+            {'op': 'remove', 'product_id': self.sock.pk},
+            {'op': 'set', 'product_id': self.shoe.pk, 'quantity': 6},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['error']['message']['operations']), [2])
+        self.assertEqual(self.client.get('/api/cart/').data, before)
+        self.product_reserved(self.shoe, 0)
+
+        response = self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'add', 'product_id': self.shoe.pk},
+            {'op': 'remove', 'product_id': self.shoe.pk},
+            {'op': 'remove', 'product_id': self.shoe.pk},
+        ]}, format='json')
+        self.assertEqual(list(response.data['error']['message']['operations']), [2])
+        self.assertEqual(self.client.get('/api/cart/').data, before)
+
+    def test_batch_size_is_capped(self):
+        operations = [{'op': 'add', 'product_id': self.sock.pk}] * 101
+        response = self.client.post('/api/cart/batch/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('operations', response.data['error']['message'])
+        self.assertEqual(self.lines(self.client.get('/api/cart/')), {})
+
+    def test_unknown_line_is_not_found(self):
+        self.client.post('/api/cart/add/', {'product_id': self.shoe.pk}, format='json')
+        response = self.client.put(f'/api/cart/items/{self.sock.pk}/update/', {'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class CacheCartFlowTests(DatabaseCartFlowTests):
+    backend = 'carts.storage.CacheCartStore'
+
+    @override_settings(CART_LOCK_WAIT=0)
+    def test_busy_cart_is_a_conflict(self):
+        store = storage.CacheCartStore()
+        cache.set(f'{store.get_key(self.user)}:lock', 'other', 60)
+        response = self.client.post('/api/cart/add/', {'product_id': self.shoe.pk}, format='json')
+        self.assertEqual(response.status_code, 409)
+        cache.delete(f'{store.get_key(self.user)}:lock')
+        response = self.client.post('/api/cart/add/', {'product_id': self.shoe.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
@@ -1,104 +1,186 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from drf_spectacular.utils import extend_schema_view, extend_schema
+from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter, PolymorphicProxySerializer
+from drf_spectacular.types import OpenApiTypes
 from . import serializers, services
 from core.serializers import EmptySerializer
+from core.fieldsets import SPARSE_FIELDSET_PARAMETERS
+
+CART_TOKEN_PARAMETER = OpenApiParameter(
+    services.CART_TOKEN_HEADER, OpenApiTypes.STR, OpenApiParameter.HEADER,
+    description='Anonymous cart token. Returned in the same header by the first cart write of an '
+                'unauthenticated client; send it to login to merge the cart into the user\'s cart.',
+)
+
+CART_RESPONSE_PARAMETER = OpenApiParameter(
+    'response', OpenApiTypes.STR, enum=['full', 'delta'],
+    description='"delta" answers with only the changed lines, removed line ids, the new cart total and '
+                'the cart version instead of the whole cart. Also accepted as the X-Cart-Response header.',
+)
+
+CART_MUTATION_RESPONSE = PolymorphicProxySerializer(
+    component_name='CartMutationResponse',
+    serializers=[serializers.CartSerializer, serializers.CartDeltaSerializer],
+    resource_type_field_name=None,
+)
+
+
+class CartResponseMixin:
+    """
+    Cart views serve the user's cart, or an anonymous cart
+    identified by X-Cart-Token. Mutations answer with the cart re-read
+    through the store's read path, or in delta mode with just what the
+    store reported changing.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def wants_delta(self):
+        mode = self.request.query_params.get('response') or self.request.headers.get('X-Cart-Response')
+        return mode == 'delta'
+
+    def get_cart_owner(self):
+        if not hasattr(self, '_cart_owner'):
+            self._cart_owner = services.get_cart_owner(self.request, create=self.request.method != 'GET')
+        return self._cart_owner
+
+    def get_cart_response(self, status_code=status.HTTP_200_OK, delta=None):
+        if delta is not None and self.wants_delta():
+            data = serializers.CartDeltaSerializer(delta, context=self.get_serializer_context()).data
+            return self.with_cart_token(Response(data, status=status_code))
+
+        serializer = serializers.CartSerializer(context=self.get_serializer_context())
+        serializer.instance = services.get_cart_detail(
+            self.get_cart_owner(), with_items='items' in serializer.fields
+        )
+        return self.with_cart_token(Response(serializer.data, status=status_code))
+
+    def with_cart_token(self, response):
+        owner = self.get_cart_owner()
+        if isinstance(owner, str):
+            response[services.CART_TOKEN_HEADER] = owner
+        return response
 
 
 @extend_schema_view(
     post=extend_schema(
         summary="Add Product to Cart",
-        description="Adds a product to the authenticated user's cart. "
+        description="Adds a product to the user's cart. "
                     "If the product is already in the cart, increases its quantity. "
                     "Quantity defaults to 1 if not provided.",
         tags=["Cart"],
+        parameters=[CART_TOKEN_PARAMETER, CART_RESPONSE_PARAMETER],
+        responses={201: CART_MUTATION_RESPONSE},
     )
 )
-class AddToCartView(generics.GenericAPIView):
+class AddToCartView(CartResponseMixin, generics.GenericAPIView):
     serializer_class = serializers.AddToCartSerializer
-    permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        cart = services.add_product_to_cart(
-            user=request.user,
+        delta = services.add_product_to_cart(
+            owner=self.get_cart_owner(),
             product_id=serializer.validated_data["product_id"],
             quantity=serializer.validated_data.get("quantity", 1)
         )
-        return Response(
-            serializers.CartSerializer(cart).data,
-            status=status.HTTP_201_CREATED
-        )
+        return self.get_cart_response(status.HTTP_201_CREATED, delta)
+
+
+@extend_schema_view(
+    post=extend_schema(
+        summary="Batch Update Cart",
+        description="Applies a list of operations to the user's cart in one transaction and returns the cart once. "
+                    "`add` increases a product's quantity (default 1), `set` replaces it (0 removes the line) and "
+                    "`remove` deletes it. All products are checked in one query; if any operation fails, "
+                    "none are applied and the error is keyed by the operation's index.",
+        tags=["Cart"],
+        parameters=[CART_TOKEN_PARAMETER, CART_RESPONSE_PARAMETER],
+        responses={200: CART_MUTATION_RESPONSE},
+    )
+)
+class CartBatchView(CartResponseMixin, generics.GenericAPIView):
+    serializer_class = serializers.CartBatchSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        delta = services.apply_cart_operations(self.get_cart_owner(), serializer.validated_data["operations"])
+        return self.get_cart_response(delta=delta)
 
 
 @extend_schema_view(
     get=extend_schema(
         summary="Retrieve Cart",
-        description="Returns the full details of the authenticated user's cart. ",
+        description="Returns the full details of the user's cart. ",
         tags=["Cart"],
+        parameters=[*SPARSE_FIELDSET_PARAMETERS, CART_TOKEN_PARAMETER],
     )
 )
-class CartDetailView(generics.RetrieveAPIView):
+class CartDetailView(CartResponseMixin, generics.RetrieveAPIView):
     serializer_class = serializers.CartSerializer
-    permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return services.get_cart_or_create(self.request.user)
+        # Omitting items skips their prefetch; the totals are annotations either way.
+        with_items = 'items' in self.get_serializer().fields
+        return services.get_cart_detail(self.get_cart_owner(), with_items=with_items)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.with_cart_token(super().retrieve(request, *args, **kwargs))
 
 
 @extend_schema_view(
     put=extend_schema(
         summary="Update Cart Item Quantity",
-        description="Updates the quantity of a specific item in the authenticated user's cart. "
+        description="Updates the quantity of a specific item in the user's cart, by its line id (the product id). "
                     "Use quantity=0 to remove the item entirely (alternative to delete endpoint).",
         tags=["Cart"],
+        parameters=[CART_TOKEN_PARAMETER, CART_RESPONSE_PARAMETER],
+        responses={200: CART_MUTATION_RESPONSE},
     )
 )
-class UpdateCartItemView(generics.GenericAPIView):
+class UpdateCartItemView(CartResponseMixin, generics.GenericAPIView):
     serializer_class = serializers.CartItemUpdateSerializer
-    permission_classes = [permissions.IsAuthenticated]
 
     def put(self, request, pk):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        cart = services.update_cart_item(
-            user=request.user,
-            cart_item_id=pk,
+        delta = services.update_cart_item(
+            owner=self.get_cart_owner(),
+            line_id=pk,
             quantity=serializer.validated_data["quantity"]
         )
-        return Response(serializers.CartSerializer(cart).data)
+        return self.get_cart_response(delta=delta)
 
 
 @extend_schema_view(
     delete=extend_schema(
         summary="Remove Item from Cart",
-        description="Removes a specific item from the authenticated user's cart by cart item ID.",
+        description="Removes a specific item from the user's cart by its line id (the product id).",
         tags=["Cart"],
-        responses={200: serializers.CartSerializer},
+        parameters=[CART_TOKEN_PARAMETER, CART_RESPONSE_PARAMETER],
+        responses={200: CART_MUTATION_RESPONSE},
     )
 )
-class DeleteCartItemView(generics.GenericAPIView):
+class DeleteCartItemView(CartResponseMixin, generics.GenericAPIView):
     serializer_class = EmptySerializer
-    permission_classes = [permissions.IsAuthenticated]
 
     def delete(self, request, pk):
-        cart = services.delete_cart_item(request.user, pk)
-        return Response(serializers.CartSerializer(cart).data)
+        delta = services.delete_cart_item(self.get_cart_owner(), pk)
+        return self.get_cart_response(delta=delta)
 
 
 @extend_schema_view(
     delete=extend_schema(
         summary="Clear Entire Cart",
-        description="Removes all items from the authenticated user's cart.",
+        description="Removes all items from the user's cart.",
         tags=["Cart"],
-        responses={200: serializers.CartSerializer},
+        parameters=[CART_TOKEN_PARAMETER, CART_RESPONSE_PARAMETER],
+        responses={200: CART_MUTATION_RESPONSE},
     )
 )
-class ClearCartView(generics.GenericAPIView):
+class ClearCartView(CartResponseMixin, generics.GenericAPIView):
     serializer_class = EmptySerializer
-    permission_classes = [permissions.IsAuthenticated]
 
     def delete(self, request):
-        cart = services.clear_cart(request.user)
-        return Response(serializers.CartSerializer(cart).data)
\ No newline at end of file
+        delta = services.clear_cart(self.get_cart_owner())
+        return self.get_cart_response(delta=delta)
\ No newline at end of file
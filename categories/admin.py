@@ -3,7 +3,8 @@ from .models import Category
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('id', 'title', 'slug')
+    list_display = ('id', 'title', 'slug', 'parent')
+    readonly_fields = ('path', 'depth')
     prepopulated_fields = {'slug': ('title',)}
     search_fields = ('title', 'slug')
-    ordering = ('title',)
+    ordering = ('path',)
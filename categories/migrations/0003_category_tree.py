@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+
+def populate_paths(apps, schema_editor):
+    # Every existing category becomes a root.
+    Category = apps.get_model('categories', 'Category')
+    Category.objects.update(path=Concat(Cast('id', CharField()), Value('/')), depth=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0002_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='children', to='categories.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
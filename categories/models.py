@@ -1,10 +1,76 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
+
+PATH_SEPARATOR = '/'
+
+
+class CategoryQuerySet(models.QuerySet):
+    def subtree(self, path):
+        """
+        Categories whose materialized path starts with `path`. Written as a
+        range so it is an index scan everywhere: '/' sorts right before '0',
+        so every descendant of '1/5/' sorts in ['1/5/', '1/50').
+        """
+        return self.filter(path__gte=path, path__lt=path[:-1] + '0')
+
 
 class Category(models.Model):
     title = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True)
     description = models.TextField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    parent = models.ForeignKey(
+        'self', on_delete=models.RESTRICT, null=True, blank=True, related_name='children'
+    )
+    # Ancestor ids root-first, e.g. '1/5/12/'; kept in sync by save().
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CategoryQuerySet.as_manager()
 
     def __str__(self):
         return self.title
+
+    def get_path(self):
+        parent_path = self.parent.path if self.parent_id else ''
+        return f'{parent_path}{self.pk}{PATH_SEPARATOR}'
+
+    def validate_parent(self, parent_id):
+        """A category cannot be moved under itself or its subcategories; checked against stored paths."""
+        if not self.pk or not parent_id:
+            return
+        paths = dict(Category.objects.filter(pk__in=[self.pk, parent_id]).values_list('pk', 'path'))
+        own_path = paths.get(self.pk)
+        if parent_id == self.pk or (own_path and paths.get(parent_id, '').startswith(own_path)):
+            raise ValidationError({'parent': 'A category cannot be moved under itself or its subcategories'})
+
+    def clean(self):
+        super().clean()
+        self.validate_parent(self.parent_id)
+
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        # Every write path (API, admin, ORM) goes through here; a cycle would
+        # corrupt the materialized paths of the whole subtree.
+        self.clean()
+        super().save(*args, **kwargs)
+        path = self.get_path()
+        if path != self.path:
+            self.move_subtree(path)
+
+    def move_subtree(self, path):
+        """Re-path this category and all of its descendants with one UPDATE."""
+        depth = path.count(PATH_SEPARATOR) - 1
+        if self.path:
+            Category.objects.subtree(self.path).update(
+                path=Concat(Value(path), Substr('path', len(self.path) + 1)),
+                depth=F('depth') + (depth - self.depth),
+                updated_at=timezone.now(),
+            )
+        else:
+            Category.objects.filter(pk=self.pk).update(path=path, depth=depth)
+        self.path, self.depth = path, depth
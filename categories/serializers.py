@@ -1,28 +1,90 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from .models import Category
+from products.models import Product
 from products.serializers import ProductReadSerializer
+from core.fieldsets import SparseFieldsetMixin
+from core.pagination import StandardCursorPagination
 
 
 class CategoryListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ('id', 'title')
+        fields = ('id', 'title', 'parent')
+
+
+class CategoryStatsSerializer(CategoryListSerializer):
+    product_count = serializers.IntegerField(read_only=True)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True, allow_null=True)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True, allow_null=True)
+    in_stock_count = serializers.IntegerField(read_only=True)
+
+    class Meta(CategoryListSerializer.Meta):
+        fields = CategoryListSerializer.Meta.fields + ('product_count', 'min_price', 'max_price', 'in_stock_count')
 
 
 class CategoryWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ('title', 'slug', 'description', 'is_active')
+        fields = ('title', 'slug', 'description', 'is_active', 'parent')
+
+    def validate_parent(self, parent):
+        if parent and self.instance:
+            try:
+                self.instance.validate_parent(parent.pk)
+            except DjangoValidationError as e:
+                raise serializers.ValidationError(e.message_dict['parent'])
+        return parent
+
+
+class CategoryTreeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    slug = serializers.SlugField()
+    children = serializers.ListField(child=serializers.DictField())
 
 
-class CategoryDetailSerializer(serializers.ModelSerializer):
+class CategoryBreadcrumbSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    slug = serializers.SlugField()
+
+
+class CategoryProductPageSerializer(serializers.Serializer):
+    count = serializers.IntegerField()
+    next = serializers.URLField(allow_null=True)
+    results = ProductReadSerializer(many=True)
+
+
+class CategoryDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     products = serializers.SerializerMethodField()
 
+    # Products come from the view's sliced prefetch, not the category row.
+    field_dependencies = {'products': ()}
+
     class Meta:
         model = Category
-        fields = ('id', 'title', 'description', 'slug', 'is_active', 'products')
+        fields = ('id', 'title', 'description', 'slug', 'is_active', 'parent', 'products')
 
-    @extend_schema_field(ProductReadSerializer(many=True))
+    @extend_schema_field(CategoryProductPageSerializer)
     def get_products(self, obj):
-        return ProductReadSerializer(obj.products.all(), many=True).data
\ No newline at end of file
+        """First page of products; `next` continues on /categories/{id}/products/ by cursor."""
+        paginator = StandardCursorPagination()
+        page = getattr(obj, 'product_page', None)
+        if page is None:
+            queryset = Product.objects.filter(
+                is_active=True, category__path__startswith=obj.path
+            ).select_related('category')
+            page = list(queryset.order_by(*paginator.ordering)[:paginator.page_size + 1])
+            obj.product_count = queryset.count()
+
+        request = self.context.get('request')
+        base_url = reverse('category-products', kwargs={'pk': obj.pk}, request=request)
+        results = paginator.paginate_first_page(page, request, base_url)
+        return {
+            'count': obj.product_count,
+            'next': paginator.get_next_link(),
+            'results': ProductReadSerializer(results, many=True, **self.get_nested_fieldset('products')).data,
+        }
@@ -1,3 +1,124 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from rest_framework.test import APIClient
+from products.models import Product
+from .models import Category
 
-# Create your tests here.
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = Category.objects.create(title='Clothing', slug='clothing')
+        self.child = Category.objects.create(title='Shoes', slug='shoes', parent=self.root)
+        self.grandchild = Category.objects.create(title='Sneakers', slug='sneakers', parent=self.child)
+
+    def paths(self):
+        return dict(Category.objects.values_list('slug', 'path'))
+
+    def test_move_repaths_the_subtree(self):
+        other = Category.objects.create(title='Sale', slug='sale')
+        self.child.parent = other
+        self.child.save()
+        self.assertEqual(self.paths()['sneakers'], f'{other.pk}/{self.child.pk}/{self.grandchild.pk}/')
+
+    def test_orm_save_rejects_cycles(self):
+        before = self.paths()
+        for parent in (self.root, self.grandchild):
+            root = Category.objects.get(pk=self.root.pk)
+            root.parent = parent
+            with self.assertRaises(ValidationError):
+                root.save()
+        self.assertEqual(self.paths(), before)
+
+    def test_full_clean_reports_the_parent(self):
+        self.root.parent = self.grandchild
+        with self.assertRaises(ValidationError) as context:
+            self.root.full_clean()
+        self.assertIn('parent', context.exception.message_dict)
+
+    def test_api_rejects_cycles(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser('admin', password='pw'))
+        response = client.patch(f'/api/categories/{self.root.pk}/', {'parent': self.grandchild.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.paths()['sneakers'], f'{self.root.pk}/{self.child.pk}/{self.grandchild.pk}/')
+
+
+class CategoryProductsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.root = Category.objects.create(title='Clothing', slug='clothing')
+        self.child = Category.objects.create(title='Shoes', slug='shoes', parent=self.root)
+        self.grandchild = Category.objects.create(title='Sneakers', slug='sneakers', parent=self.child)
+        self.other = Category.objects.create(title='Garden', slug='garden')
+        for category, count in ((self.root, 2), (self.child, 3), (self.grandchild, 8), (self.other, 1)):
+            Product.objects.bulk_create([
+                Product(title=f'{category.title} {i}', slug=f'{category.slug}-{i}', price=Decimal(10 + i),
+                        stock=5, category=category)
+                for i in range(count)
+            ])
+        Product.objects.filter(slug='sneakers-0').update(is_active=False)
+
+    def walk(self, url, params=None):
+        return self.follow(self.client.get(url, {'pagination': 'cursor', **(params or {})}))
+
+    def follow(self, response):
+        titles = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            titles += [row['title'] for row in response.data['results']]
+            if not response.data['next']:
+                return titles
+            response = self.client.get(response.data['next'])
+
+    def test_products_of_the_whole_subtree(self):
+        expected = Product.objects.filter(
+            is_active=True, category__in=[self.child, self.grandchild]
+        ).order_by('-created_at', '-id').values_list('title', flat=True)
+        self.assertEqual(self.walk(f'/api/categories/{self.child.pk}/products/'), list(expected))
+        self.assertEqual(len(self.walk(f'/api/categories/{self.root.pk}/products/')), 12)
+        self.assertEqual(len(self.walk(f'/api/categories/{self.grandchild.pk}/products/', {'price__lt': 14})), 3)
+        self.assertEqual(self.client.get('/api/categories/999999/products/').status_code, 404)
+
+    def test_detail_page_continues_on_the_products_endpoint(self):
+        response = self.client.get(f'/api/categories/{self.root.pk}/')
+        products = response.data['products']
+        self.assertEqual(products['count'], 12)
+        self.assertEqual(len(products['results']), 10)
+
+        titles = [row['title'] for row in products['results']]
+        titles += self.follow(self.client.get(products['next']))
+        self.assertEqual(titles, self.walk(f'/api/categories/{self.root.pk}/products/'))
+
+    def test_detail_etag_follows_subtree_products(self):
+        url = f'/api/categories/{self.root.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        product = Product.objects.get(slug='sneakers-3')
+        product.price = Decimal('99.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('99.00', [row['price'] for row in response.data['products']['results']])
+
+    def test_stats_cover_the_subtree(self):
+        Category.objects.create(title='Empty', slug='empty')
+        Product.objects.filter(slug='shoes-1').update(stock=0)
+        response = self.client.get('/api/categories/', {'stats': 'true'})
+        stats = {
+            row['title']: (row['product_count'], row['min_price'], row['max_price'], row['in_stock_count'])
+            for row in response.data['results']
+        }
+        self.assertEqual(stats, {
+            'Clothing': (12, '10.00', '17.00', 11),
+            'Shoes': (10, '10.00', '17.00', 9),
+            'Sneakers': (7, '11.00', '17.00', 7),
+            'Garden': (1, '10.00', '10.00', 1),
+            'Empty': (0, None, None, 0),
+        })
@@ -0,0 +1,82 @@
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from core.cache import get_generations
+from .models import Category
+
+TREE_FIELDS = ('id', 'parent_id', 'title', 'slug', 'path', 'depth', 'is_active')
+
+_local = (None, None)
+
+
+class CategoryTree:
+    """The whole hierarchy, built from one query and shared between requests."""
+
+    def __init__(self, rows):
+        self.nodes = {row['id']: row for row in rows}
+        self.ids_by_slug = {row['slug']: row['id'] for row in rows}
+        self.children = defaultdict(list)
+        for row in sorted(rows, key=lambda row: row['title']):
+            self.children[row['parent_id']].append(row['id'])
+
+    def resolve(self, value):
+        """Category id for a slug or an id, None if unknown."""
+        value = str(value)
+        if value in self.ids_by_slug:
+            return self.ids_by_slug[value]
+        if value.isdigit() and int(value) in self.nodes:
+            return int(value)
+        return None
+
+    def is_visible(self, category_id):
+        """Active, and so are all of its ancestors."""
+        return all(node['is_active'] for node in self.ancestors(category_id))
+
+    def ancestors(self, category_id):
+        """Root-first chain ending with the category itself."""
+        node = self.nodes.get(category_id)
+        if node is None:
+            return []
+        return [self.nodes[int(pk)] for pk in node['path'].rstrip('/').split('/')]
+
+    def subtree_ids(self, category_id):
+        ids, stack = [], [category_id] if category_id in self.nodes else []
+        while stack:
+            pk = stack.pop()
+            ids.append(pk)
+            stack.extend(self.children[pk])
+        return ids
+
+    def as_nested(self, parent_id=None, active_only=False):
+        return [
+            {
+                'id': node['id'],
+                'title': node['title'],
+                'slug': node['slug'],
+                'children': self.as_nested(node['id'], active_only),
+            }
+            for node in map(self.nodes.get, self.children[parent_id])
+            if node['is_active'] or not active_only
+        ]
+
+
+def get_category_tree():
+    """
+    Cached tree for the current category generation. Rows live in the shared
+    cache; each process also keeps the last tree it built.
+    """
+    global _local
+    generation, = get_generations(['categories.Category'])
+    cached_generation, tree = _local
+    if cached_generation == generation:
+        return tree
+
+    key = f'category-tree:{generation}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(Category.objects.order_by('path').values(*TREE_FIELDS))
+        cache.set(key, rows, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300))
+
+    tree = CategoryTree(rows)
+    _local = (generation, tree)
+    return tree
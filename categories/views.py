@@ -1,23 +1,64 @@
 from rest_framework.viewsets import ModelViewSet
-from django.db.models import RestrictedError
+from django.db.models import Count, F, Func, Max, Min, OuterRef, Q, RestrictedError, Subquery
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework import status
-from drf_spectacular.utils import extend_schema_view, extend_schema
+from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter
+from drf_spectacular.types import OpenApiTypes
 from .models import Category
+from .tree import get_category_tree
 from . import serializers
+from products.filters import ProductFilter, ProductSearchFilter
+from products.models import Product
+from products.serializers import ProductReadSerializer
 from core.permissions import IsAdminOrReadOnly
+from core.cache import CachedReadMixin
+from core.conditional import ConditionalGetMixin
+from core.fieldsets import SparseQuerysetMixin, SPARSE_FIELDSET_PARAMETERS, get_sparse_queryset
+from core.pagination import CursorOrPageNumberPagination, StandardCursorPagination
 
 
 @extend_schema_view(
     list=extend_schema(
         summary="List Categories",
-        description="Returns a list of active categories. Admin users can see all categories (including inactive ones).",
+        description="Returns a list of active categories. Admin users can see all categories (including inactive ones). "
+                    "With ?stats=true each category also carries product_count, min_price, max_price and "
+                    "in_stock_count over the active products of it and its subcategories, computed in one "
+                    "aggregate query.",
         tags=["Categories"],
+        parameters=[OpenApiParameter('stats', OpenApiTypes.BOOL, description='Include product statistics.')],
     ),
     retrieve=extend_schema(
         summary="Retrieve Category Detail",
-        description="Returns detailed information for a specific category by ID. Only active categories are accessible to non-admin users.",
+        description="Returns detailed information for a specific category by ID. Only active categories are accessible to non-admin users. "
+                    "Embeds the first page of active products in it and its subcategories, with their total count; "
+                    "`products.next` continues on the category products endpoint.",
         tags=["Categories"],
+        parameters=SPARSE_FIELDSET_PARAMETERS,
+    ),
+    products=extend_schema(
+        summary="List Category Products",
+        description="Returns the active products of a category and all of its subcategories, paginated. "
+                    "Accepts the same filters, search and ordering as the product list, "
+                    "and ?pagination=cursor for keyset pagination.",
+        tags=["Categories"],
+        responses=ProductReadSerializer(many=True),
+    ),
+    tree=extend_schema(
+        summary="Category Tree",
+        description="Returns the whole category hierarchy as nested children, served from the cached tree. "
+                    "Inactive categories (and their subcategories) are only shown to admin users.",
+        tags=["Categories"],
+        responses=serializers.CategoryTreeSerializer(many=True),
+    ),
+    breadcrumbs=extend_schema(
+        summary="Category Breadcrumbs",
+        description="Returns the chain of categories from the root down to this category, served from the cached tree.",
+        tags=["Categories"],
+        responses=serializers.CategoryBreadcrumbSerializer(many=True),
     ),
     create=extend_schema(
         summary="Create Category (Admin)",
@@ -36,8 +77,8 @@ from core.permissions import IsAdminOrReadOnly
     ),
     destroy=extend_schema(
         summary="Delete Category (Admin)",
-        description="Deletes a category if it has no related products. "
-                    "If there are related products, returns a 400 error with an explanatory message. "
+        description="Deletes a category if it has no related products or subcategories. "
+                    "Otherwise returns a 400 error with an explanatory message. "
                     "Only accessible to admin users.",
         tags=["Categories"],
         responses={
@@ -46,20 +87,151 @@ from core.permissions import IsAdminOrReadOnly
         },
     ),
 )
-class CategoryViewSet(ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, CachedReadMixin, SparseQuerysetMixin, ModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
-    def get_queryset(self):
+    filterset_class = None
+    cache_models = ('categories.Category', 'products.Product')
+    cache_actions = ('list', 'retrieve', 'products')
+    cursor_ordering_fields = ('created_at', 'price')
+
+    def get_conditional_timestamps(self):
+        if self.action == 'retrieve' or self.include_stats():
+            return ('updated_at', 'subtree_updated_at')
+        return ('updated_at',)
+
+    def get_conditional_queryset(self):
+        queryset = super().get_conditional_queryset()
+        if self.action == 'retrieve' or self.include_stats():
+            # Embedded products and stats cover the whole subtree, and so must the validators.
+            latest = self.get_descendant_products().order_by('-updated_at').values('updated_at')[:1]
+            queryset = queryset.annotate(subtree_updated_at=Subquery(latest))
+        return queryset
+
+    def include_stats(self):
+        return self.action == 'list' and self.request.query_params.get('stats') in ('1', 'true')
+
+    def get_category_queryset(self):
         if self.request.user and self.request.user.is_staff:
             return Category.objects.all()
         return Category.objects.filter(is_active=True)
 
+    def get_queryset(self):
+        if self.action == 'products':
+            return self.get_product_queryset()
+
+        queryset = self.get_category_queryset()
+        if self.action == 'retrieve':
+            return self.with_product_page(self.get_sparse_queryset(queryset))
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.include_stats():
+            self.add_product_stats(page)
+        return page
+
+    def add_product_stats(self, categories):
+        """
+        Stats over the active products of each category's subtree: one GROUP BY
+        category query for the page's subtrees, rolled up along the cached tree.
+        """
+        tree = get_category_tree()
+        subtrees = {category.pk: tree.subtree_ids(category.pk) for category in categories}
+        rows = Product.objects.filter(
+            is_active=True, category_id__in=set().union(*subtrees.values())
+        ).order_by().values('category_id').annotate(
+            product_count=Count('id'),
+            min_price=Min('price'),
+            max_price=Max('price'),
+            in_stock_count=Count('id', filter=Q(stock__gt=0)),
+        )
+        stats = {row['category_id']: row for row in rows}
+
+        for category in categories:
+            subtree = [stats[pk] for pk in subtrees[category.pk] if pk in stats]
+            category.product_count = sum(row['product_count'] for row in subtree)
+            category.min_price = min((row['min_price'] for row in subtree), default=None)
+            category.max_price = max((row['max_price'] for row in subtree), default=None)
+            category.in_stock_count = sum(row['in_stock_count'] for row in subtree)
+
+    def get_product_queryset(self):
+        if self.request.user and self.request.user.is_staff:
+            return Product.objects.all()
+        return Product.objects.filter(is_active=True)
+
+    def get_subtree_product_queryset(self):
+        """Products of the category in the URL and its subcategories, like ?category= on the product list."""
+        tree = get_category_tree()
+        ids = tree.subtree_ids(tree.resolve(self.kwargs[self.lookup_url_kwarg or self.lookup_field]))
+        return self.get_product_queryset().filter(category_id__in=ids)
+
+    def get_descendant_products(self):
+        """Products under the outer query's category, for correlated subqueries."""
+        return self.get_product_queryset().filter(category__path__startswith=OuterRef('path'))
+
+    def with_product_page(self, queryset):
+        """The subtree's product count, as a subquery of the category row; get_object adds the first page."""
+        if 'products' not in self.get_serializer().fields:
+            return queryset
+
+        count = self.get_descendant_products().order_by().annotate(
+            count=Func(F('id'), function='COUNT')
+        ).values('count')
+        return queryset.annotate(product_count=Subquery(count))
+
+    def get_object(self):
+        category = super().get_object()
+        if self.action == 'retrieve' and hasattr(category, 'product_count'):
+            # One sliced query, whatever the size of the subtree.
+            paginator = StandardCursorPagination()
+            products = ProductReadSerializer(many=True, **self.get_serializer().get_nested_fieldset('products'))
+            page = get_sparse_queryset(self.get_subtree_product_queryset(), products, required=['category', 'created_at'])
+            category.product_page = list(page.order_by(*paginator.ordering)[:paginator.page_size + 1])
+        return category
+
     def get_serializer_class(self):
         if self.action == 'list':
+            if self.include_stats():
+                return serializers.CategoryStatsSerializer
             return serializers.CategoryListSerializer
+        if self.action == 'products':
+            return ProductReadSerializer
         if self.action == 'retrieve':
             return serializers.CategoryDetailSerializer
         return serializers.CategoryWriteSerializer
 
+    @action(detail=True, methods=['get'], pagination_class=CursorOrPageNumberPagination,
+            filter_backends=[DjangoFilterBackend, ProductSearchFilter], filterset_class=ProductFilter)
+    def products(self, request, pk=None):
+        def compute(request):
+            get_object_or_404(self.get_category_queryset(), pk=pk)
+            queryset = self.get_subtree_product_queryset().order_by('-created_at', '-id')
+            queryset = self.filter_queryset(queryset)
+            # Same values() fast path as the product list.
+            queryset = queryset.values(*self.get_serializer(many=True).get_values_fields())
+
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+        return self.cached_response(compute, request)
+
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        is_staff = bool(request.user and request.user.is_staff)
+        return Response(get_category_tree().as_nested(active_only=not is_staff))
+
+    @action(detail=True, methods=['get'])
+    def breadcrumbs(self, request, pk=None):
+        tree = get_category_tree()
+        category_id = tree.resolve(pk)
+        is_staff = bool(request.user and request.user.is_staff)
+        if category_id is None or not (is_staff or tree.is_visible(category_id)):
+            raise NotFound()
+        return Response([
+            {'id': node['id'], 'title': node['title'], 'slug': node['slug']}
+            for node in tree.ancestors(category_id)
+        ])
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         try:
@@ -67,6 +239,6 @@ class CategoryViewSet(ModelViewSet):
             return Response(status=status.HTTP_204_NO_CONTENT)
         except RestrictedError:
             return Response(
-                {'message': 'Delete the related products before deleting this category.'},
+                {'message': 'Delete the related products and subcategories before deleting this category.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
\ No newline at end of file
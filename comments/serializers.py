@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import Comment
 from users.serializers import UserSimpleSerializer
 from products.serializers import ProductSimpleSerializer
+from core.fieldsets import SparseFieldsetMixin
 
 
 class CommentBaseSerializer(serializers.ModelSerializer):
@@ -32,7 +33,7 @@ class CommentUpdateSerializer(CommentBaseSerializer):
         fields = ['rating', 'text']
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSimpleSerializer(read_only=True)
     product = ProductSimpleSerializer(read_only=True)
 
@@ -0,0 +1,76 @@
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from core.cache import bump_generation_on_commit
+from products.models import Product, RATING_STARS as STARS, empty_rating_histogram
+from .models import Comment
+
+
+def rating_average(total, count):
+    if not count:
+        return Decimal('0')
+    return (Decimal(total) / count).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def apply_rating_change(product_id, added=None, removed=None):
+    """Adjust a product's rating aggregates by one added and/or removed rating."""
+    product = (
+        Product.objects.select_for_update()
+        .only('rating_count', 'rating_sum', 'rating_histogram')
+        .get(pk=product_id)
+    )
+    count, total = product.rating_count, product.rating_sum
+    histogram = {star: product.rating_histogram.get(star, 0) for star in STARS}
+
+    if removed is not None:
+        count -= 1
+        total -= removed
+        histogram[str(removed)] -= 1
+    if added is not None:
+        count += 1
+        total += added
+        histogram[str(added)] += 1
+
+    Product.objects.filter(pk=product_id).update(
+        rating_count=count,
+        rating_sum=total,
+        rating_avg=rating_average(total, count),
+        rating_histogram=histogram,
+        updated_at=timezone.now(),
+    )
+    bump_generation_on_commit('products.Product')
+
+
+@transaction.atomic
+def rebuild_product_ratings(batch_size=500):
+    stats = (
+        Comment.objects.order_by()
+        .values('product_id')
+        .annotate(
+            count=Count('id'),
+            total=Sum('rating'),
+            **{f'star_{star}': Count('id', filter=Q(rating=int(star))) for star in STARS}
+        )
+    )
+    products = [
+        Product(
+            id=row['product_id'],
+            rating_count=row['count'],
+            rating_sum=row['total'],
+            rating_avg=rating_average(row['total'], row['count']),
+            rating_histogram={star: row[f'star_{star}'] for star in STARS},
+        )
+        for row in stats
+    ]
+
+    # Every histogram carries all five stars, as apply_rating_change writes them.
+    Product.objects.update(
+        rating_count=0, rating_sum=0, rating_avg=0, rating_histogram=empty_rating_histogram(),
+        updated_at=timezone.now(),
+    )
+    Product.objects.bulk_update(
+        products, ['rating_count', 'rating_sum', 'rating_avg', 'rating_histogram'], batch_size=batch_size
+    )
+    bump_generation_on_commit('products.Product')
+    return len(products)
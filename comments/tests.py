@@ -1,3 +1,34 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
 from django.test import TestCase
+from categories.models import Category
+from products.models import Product
+from . import services
+from .models import Comment
 
-# Create your tests here.
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        self.rated, self.unrated = Product.objects.bulk_create([
+            Product(title=title, slug=title.lower(), price=Decimal('10.00'), stock=5, category=category)
+            for title in ('Rated', 'Unrated')
+        ])
+        users = User.objects.bulk_create([User(username=f'user-{i}') for i in range(3)])
+        for user, rating in zip(users, (5, 5, 2)):
+            Comment.objects.create(product=self.rated, user=user, rating=rating)
+            services.apply_rating_change(self.rated.pk, added=rating)
+
+    def aggregates(self):
+        return {
+            product.slug: (product.rating_count, product.rating_avg, product.rating_histogram)
+            for product in Product.objects.all()
+        }
+
+    def test_rebuild_matches_incremental_aggregates(self):
+        incremental = self.aggregates()
+        self.assertEqual(incremental['rated'], (3, Decimal('4.00'), {'1': 0, '2': 1, '3': 0, '4': 0, '5': 2}))
+
+        services.rebuild_product_ratings()
+        self.assertEqual(self.aggregates(), incremental)
+        self.assertEqual(self.aggregates()['unrated'][2], {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0})
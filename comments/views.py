@@ -1,9 +1,13 @@
+from django.db import transaction
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from drf_spectacular.utils import extend_schema_view, extend_schema
 from .models import Comment
 from .serializers import CommentSerializer, CommentCreateSerializer, CommentUpdateSerializer
 from core.permissions import IsOwnerOrReadOnly
+from . import services
+from core.pagination import CursorOrPageNumberPagination
+from core.fieldsets import SparseQuerysetMixin, SPARSE_FIELDSET_PARAMETERS
 
 
 @extend_schema_view(
@@ -12,11 +16,13 @@ from core.permissions import IsOwnerOrReadOnly
         description="Returns a list of all approved/active comments. "
                     "Read-only for unauthenticated users.",
         tags=["Comments"],
+        parameters=SPARSE_FIELDSET_PARAMETERS,
     ),
     retrieve=extend_schema(
         summary="Retrieve Comment Detail",
         description="Returns detailed information for a specific comment by ID.",
         tags=["Comments"],
+        parameters=SPARSE_FIELDSET_PARAMETERS,
     ),
     create=extend_schema(
         summary="Create Comment",
@@ -40,9 +46,15 @@ from core.permissions import IsOwnerOrReadOnly
         tags=["Comments"],
     ),
 )
-class CommentViewSet(ModelViewSet):
+class CommentViewSet(SparseQuerysetMixin, ModelViewSet):
     queryset = Comment.objects.select_related('user', 'product')
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = CursorOrPageNumberPagination
+
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return self.get_sparse_queryset(Comment.objects.all())
+        return super().get_queryset()
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -56,5 +68,19 @@ class CommentViewSet(ModelViewSet):
             return [IsAuthenticated(), IsOwnerOrReadOnly()]
         return super().get_permissions()
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        comment = serializer.save(user=self.request.user)
+        services.apply_rating_change(comment.product_id, added=comment.rating)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old_rating = serializer.instance.rating
+        comment = serializer.save()
+        if comment.rating != old_rating:
+            services.apply_rating_change(comment.product_id, added=comment.rating, removed=old_rating)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        services.apply_rating_change(instance.product_id, removed=instance.rating)
\ No newline at end of file
@@ -91,6 +91,26 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    }
+}
+
+
+# Cache
+# Generation counters, cached catalog responses and cart state must be seen by
+# every process (web workers and management commands alike), so the default
+# cache is shared. The database cache needs `python manage.py createcachetable`;
+# in production point these at Redis, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://127.0.0.1:6379/1
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': config('CACHE_LOCATION', default='django_cache'),
     }
 }
 
@@ -167,6 +187,60 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL  = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# None picks the backend for the database in use: FTS5 on SQLite, an
+# icontains scan elsewhere.
+PRODUCT_SEARCH_BACKEND = None
+PRODUCT_FACET_PRICE_EDGES = (0, 50, 100, 250, 500, 1000)
+
+CATALOG_CACHE_TIMEOUT = 300
+
+PRODUCT_IMAGE_WIDTHS = (320, 640, 1280)
+PRODUCT_IMAGE_WORKERS = 2
+
+PRODUCT_RELATED_TOP_K = 10
+
+# 'carts.storage.CacheCartStore' keeps active carts in the cache and writes
+# them behind to the database; it needs a cache shared by all processes.
+CART_STORAGE_BACKEND = 'carts.storage.DatabaseCartStore'
+CART_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+CART_LOCK_TIMEOUT = 10
+# How long a cache cart write waits for another one on the same cart.
+CART_LOCK_WAIT = 5
+CART_FLUSH_WORKERS = 1
+
+# Cart lines hold stock for this many seconds after the cart was last
+# touched; 0 turns reservations off. Run release_expired_reservations
+# periodically to hand expired holds back. A user holds at most
+# CART_RESERVATION_MAX_QUANTITY units of each product; anonymous carts hold
+# nothing until they are merged at login.
+CART_RESERVATION_TTL = 15 * 60
+CART_RESERVATION_MAX_QUANTITY = 10
+CART_RESERVATION_SWEEP_BATCH = 500
+
+# Successful responses to requests sent with an Idempotency-Key header are
+# replayed for this many seconds; run purge_idempotency_keys to drop old ones.
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+# How long a retry waits for the first request with its key to finish before
+# getting a 409.
+IDEMPOTENCY_WAIT = 5
+# A request still unfinished after this many seconds is assumed to have died
+# with its worker; a retry with the same key then runs it again.
+IDEMPOTENCY_CLAIM_TIMEOUT = 60
+
+# Order and payment side effects go through the outbox: dotted paths of the
+# handlers run_outbox_worker calls for each topic. Delivery is at-least-once,
+# so handlers must tolerate seeing a message twice.
+OUTBOX_HANDLERS = {
+    'order.created': ['core.outbox.log_message'],
+    'payment.completed': ['core.outbox.log_message'],
+}
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_WORKERS = 4
+OUTBOX_LEASE = 5 * 60
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_RETRY_DELAY = 10
+OUTBOX_RETRY_MAX_DELAY = 60 * 60
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'E-Commerce API',
     'DESCRIPTION': 'E-commerce DRF backend API | GitHub: berkaykhrmn ',
@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import OutboxMessage
 
-# Register your models here.
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'status', 'attempts', 'available_at', 'created_at', 'delivered_at')
+    list_filter = ('status', 'topic')
+    readonly_fields = ('created_at', 'delivered_at', 'last_error')
+    ordering = ('-created_at',)
@@ -0,0 +1,86 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+GENERATION_KEY = 'generation:{}'
+
+
+def get_generations(labels):
+    keys = [GENERATION_KEY.format(label) for label in labels]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            # A time-based seed means an evicted counter never comes back at a
+            # value that older cache entries were stored under.
+            cache.add(key, time.time_ns(), timeout=None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def bump_generation(label):
+    key = GENERATION_KEY.format(label)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_generation_on_commit(label):
+    transaction.on_commit(lambda: bump_generation(label))
+
+
+def normalize_query_string(query_params):
+    items = sorted(
+        (key, value)
+        for key in query_params
+        for value in query_params.getlist(key)
+        if value != ''
+    )
+    return urlencode(items)
+
+
+class CachedReadMixin:
+    """
+    Caches list/retrieve response data for ViewSets. Keys carry the generation
+    of every model in `cache_models`, so a write only has to bump a counter.
+    """
+    cache_actions = ('list', 'retrieve')
+    cache_models = ()
+
+    def get_response_cache_key(self, request):
+        is_staff = bool(request.user and request.user.is_staff)
+        generations = get_generations(self.cache_models)
+        raw = '|'.join([
+            request.get_host(),
+            request.path,
+            normalize_query_string(request.query_params),
+            request.accepted_renderer.format,
+            'staff' if is_staff else 'public',
+            *map(str, generations),
+        ])
+        digest = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+        return f'response:{self.__class__.__name__}:{self.action}:{digest}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.cache_actions:
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
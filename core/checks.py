@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Cache generations are bumped by whichever process wrote the data; a cache
+    private to each process would keep serving stale catalog responses.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND', PROCESS_LOCAL_CACHES[0])
+    if backend in PROCESS_LOCAL_CACHES and getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300):
+        return [Error(
+            f"The default cache ({backend}) is local to each process, so catalog cache "
+            f"invalidations made by one process are not seen by others.",
+            hint="Use a shared cache (database, Redis or Memcached) or set CATALOG_CACHE_TIMEOUT = 0.",
+            id='core.E001',
+        )]
+    return []
@@ -0,0 +1,90 @@
+import hashlib
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+from .cache import normalize_query_string
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag/Last-Modified to list/retrieve responses and answers matching
+    If-None-Match/If-Modified-Since with 304. Validators come from a single
+    MAX(updated_at)/COUNT aggregate over the filtered queryset, so nothing is
+    serialized before the check.
+
+    Last-Modified is only sent for single objects: a deleted or filtered-out
+    row never moves a collection's MAX(updated_at), so lists rely on the
+    ETag, which also covers the row count.
+    """
+    conditional_actions = ('list', 'retrieve')
+    last_modified_actions = ('retrieve',)
+    conditional_timestamps = ('updated_at',)
+
+    def get_conditional_timestamps(self):
+        return self.conditional_timestamps
+
+    def get_conditional_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def get_conditional_validators(self, request):
+        aggregates = {f'max_{i}': Max(field) for i, field in enumerate(self.get_conditional_timestamps())}
+        values = self.get_conditional_queryset().aggregate(rows=Count('pk'), **aggregates)
+        rows = values.pop('rows')
+        timestamps = [value for value in values.values() if value is not None]
+        last_modified = None
+        if timestamps and self.action in self.last_modified_actions:
+            last_modified = max(timestamps)
+
+        is_staff = bool(request.user and request.user.is_staff)
+        raw = '|'.join([
+            request.path,
+            normalize_query_string(request.query_params),
+            request.accepted_renderer.format,
+            'staff' if is_staff else 'public',
+            str(rows),
+            *(value.isoformat() if value else '' for value in values.values()),
+        ])
+        etag = '"%s"' % hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+        return rows, etag, last_modified
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or etag in etags
+
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        if if_modified_since is not None and last_modified is not None:
+            return int(last_modified.timestamp()) <= if_modified_since
+        return False
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.conditional_actions:
+            return handler(request, *args, **kwargs)
+
+        rows, etag, last_modified = self.get_conditional_validators(request)
+        if self.action == 'retrieve' and not rows:
+            return handler(request, *args, **kwargs)
+
+        if self.is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
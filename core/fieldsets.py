@@ -0,0 +1,215 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+SPARSE_FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        FIELDS_PARAM, OpenApiTypes.STR,
+        description='Comma-separated fields to return. Dotted paths select nested fields, e.g. id,items.quantity.'
+    ),
+    OpenApiParameter(
+        OMIT_PARAM, OpenApiTypes.STR,
+        description='Comma-separated fields to leave out. Dotted paths omit nested fields.'
+    ),
+]
+
+
+def parse_fieldset(value):
+    """'id,items.product.title' -> {'id': {}, 'items': {'product': {'title': {}}}}"""
+    if value is None or isinstance(value, dict):
+        return value
+    if not isinstance(value, str):
+        value = ','.join(value)
+
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree or None
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for ?fields= and ?omit=. The root serializer reads them
+    from the request; nested serializers using the mixin get their share of
+    dotted paths from the parent, or from `fields=`/`omit=` kwargs.
+
+    `field_dependencies` maps SerializerMethodFields to the lookups they read,
+    so get_sparse_queryset can still defer every other column.
+    """
+    field_dependencies = {}
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._fieldset = None
+        if fields is not None or omit is not None:
+            self._fieldset = (parse_fieldset(fields), parse_fieldset(omit))
+
+    def get_fieldset(self):
+        if self._fieldset is not None:
+            return self._fieldset
+
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        request = self.context.get('request')
+        if parent is not None or request is None:
+            return None, None
+        return (
+            parse_fieldset(request.query_params.get(FIELDS_PARAM)),
+            parse_fieldset(request.query_params.get(OMIT_PARAM)),
+        )
+
+    def get_nested_fieldset(self, name):
+        """`fields`/`omit` kwargs for a nested serializer that is built by hand."""
+        include, omit = self.get_fieldset()
+        return {
+            'fields': include.get(name) or None if include is not None else None,
+            'omit': omit.get(name) if omit is not None else None,
+        }
+
+    def get_fields(self):
+        fields = super().get_fields()
+        include, omit = self.get_fieldset()
+        if include is None and omit is None:
+            return fields
+
+        selected = {}
+        for name, field in fields.items():
+            if include is not None and name not in include:
+                continue
+            nested_include = include.get(name) or None if include is not None else None
+            nested_omit = omit.get(name) if omit is not None else None
+            if nested_omit == {}:
+                continue
+
+            target = getattr(field, 'child', field)
+            if isinstance(target, SparseFieldsetMixin):
+                target._fieldset = (nested_include, nested_omit)
+            selected[name] = field
+        return selected
+
+
+class QueryPlan:
+    """The columns and relations of one model that a serializer reads."""
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = set()
+        self.related = {}
+        self.prefetched = {}
+        self.deferrable = True
+
+    def get_relation(self, field):
+        if field.many_to_many or field.one_to_many:
+            name = field.get_accessor_name() if field.auto_created else field.name
+            registry = self.prefetched
+        else:
+            name = field.name
+            registry = self.related
+        if name not in registry:
+            registry[name] = QueryPlan(field.related_model)
+            if field.one_to_many:
+                # Prefetching matches rows on the reverse foreign key.
+                registry[name].columns.add(field.field.attname)
+        return registry[name]
+
+    def add(self, path, serializer=None):
+        plan = self
+        for part in path.split('__'):
+            try:
+                field = plan.model._meta.get_field(part)
+            except FieldDoesNotExist:
+                # A property or method: no telling which columns it reads.
+                plan.deferrable = False
+                return
+            if not field.is_relation:
+                plan.columns.add(part)
+                return
+            plan = plan.get_relation(field)
+
+        if serializer is not None:
+            plan.collect(serializer)
+        else:
+            plan.deferrable = False
+
+    def collect(self, serializer):
+        serializer = getattr(serializer, 'child', serializer)
+        dependencies = getattr(serializer, 'field_dependencies', {})
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in dependencies:
+                for path in dependencies[name]:
+                    self.add(path)
+            elif field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+                self.deferrable = False
+            elif isinstance(field, serializers.PrimaryKeyRelatedField) and len(field.source_attrs) == 1:
+                # Only the foreign key column is read; no join needed.
+                self.columns.add(field.source)
+            else:
+                nested = getattr(field, 'child', field)
+                if not isinstance(nested, serializers.BaseSerializer):
+                    nested = None
+                self.add('__'.join(field.source_attrs), nested)
+
+    def flatten(self, prefix, select, prefetch, columns):
+        columns.update(prefix + column for column in self.columns)
+        deferrable = self.deferrable
+        for name, plan in self.related.items():
+            select.append(prefix + name)
+            if not plan.deferrable:
+                columns.add(prefix + name)
+            plan.flatten(f'{prefix}{name}__', select, prefetch, columns)
+        for name, plan in self.prefetched.items():
+            prefetch.append(Prefetch(prefix + name, queryset=plan.apply(plan.model._default_manager.all())))
+        return deferrable
+
+    def apply(self, queryset, required=()):
+        select, prefetch, columns = [], [], set(required)
+        deferrable = self.flatten('', select, prefetch, columns)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if deferrable:
+            queryset = queryset.only(*columns)
+        return queryset
+
+
+def get_sparse_queryset(queryset, serializer, required=()):
+    """
+    Narrow `queryset` to what `serializer` will output: only() the selected
+    columns, select_related forward relations and Prefetch nested lists with
+    querysets narrowed the same way. Omitted relations are never loaded.
+    """
+    plan = QueryPlan(queryset.model)
+    plan.collect(serializer)
+    return plan.apply(queryset, required)
+
+
+class SparseQuerysetMixin:
+    """View mixin: read requests load only what the selected fields need."""
+
+    def get_sparse_queryset(self, queryset):
+        if self.request.method not in ('GET', 'HEAD'):
+            return queryset
+
+        required = []
+        if (self.lookup_url_kwarg or self.lookup_field) not in self.kwargs:
+            # Ordering columns stay loaded so cursor pagination can read them.
+            ordering = (
+                *queryset.query.order_by,
+                *queryset.model._meta.ordering,
+                *getattr(self, 'cursor_ordering_fields', ('created_at',)),
+            )
+            names = {field.name for field in queryset.model._meta.concrete_fields}
+            required = [field.lstrip('-') for field in ordering if field.lstrip('-') in names]
+        return get_sparse_queryset(queryset, self.get_serializer(), required)
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    IDEMPOTENCY_HEADER, OpenApiTypes.STR, OpenApiParameter.HEADER,
+    description='Unique key for safely retrying this request. A retry with the same key and body gets the '
+                'first response back (with Idempotent-Replayed: true) instead of running it again.',
+)
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed. Retry shortly.'
+    default_code = 'idempotency_conflict'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used with a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+def get_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str) if request.data else ''
+    raw = f'{request.method} {request.path} {body}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def purge_expired_keys():
+    return IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+
+class IdempotentMixin:
+    """
+    Honours the Idempotency-Key header on writes wrapped in idempotent_response.
+    The key is claimed by inserting its row before the handler runs, so a
+    concurrent duplicate hits the unique constraint: it waits up to
+    IDEMPOTENCY_WAIT seconds for the first request, then gets a 409. Successful
+    responses are stored in the handler's transaction, for IDEMPOTENCY_KEY_TTL
+    seconds, and replayed; failed requests change nothing, so they release the
+    key and may run again. A
+    claim still unfinished after IDEMPOTENCY_CLAIM_TIMEOUT seconds belongs to
+    a crashed worker, and the next retry takes it over.
+    """
+
+    def claim_idempotency_key(self, request, key, fingerprint):
+        ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+        deadline = time.monotonic() + getattr(settings, 'IDEMPOTENCY_WAIT', 5)
+        while True:
+            try:
+                with transaction.atomic():
+                    return IdempotencyKey.objects.create(
+                        user=request.user, key=key, fingerprint=fingerprint,
+                        expires_at=timezone.now() + timedelta(seconds=ttl),
+                    ), None
+            except IntegrityError:
+                pass
+
+            record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            if record is None:
+                continue
+            if record.expires_at <= timezone.now():
+                IdempotencyKey.objects.filter(pk=record.pk, expires_at__lte=timezone.now()).delete()
+                continue
+            if record.fingerprint != fingerprint:
+                raise IdempotencyKeyReused()
+            if record.status_code is not None:
+                return None, record
+            stale = timezone.now() - timedelta(seconds=getattr(settings, 'IDEMPOTENCY_CLAIM_TIMEOUT', 60))
+            if record.claimed_at <= stale and IdempotencyKey.objects.filter(
+                pk=record.pk, status_code__isnull=True, claimed_at=record.claimed_at
+            ).update(claimed_at=timezone.now()):
+                return record, None
+            if time.monotonic() >= deadline:
+                raise IdempotencyConflict()
+            time.sleep(0.05)
+
+    def idempotent_response(self, handler, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            raise ValidationError({IDEMPOTENCY_HEADER: ['Ensure this value has at most 255 characters.']})
+
+        claim, record = self.claim_idempotency_key(request, key, get_fingerprint(request))
+        if record is not None:
+            response = Response(record.response, status=record.status_code)
+            response[REPLAYED_HEADER] = 'true'
+            return response
+
+        try:
+            with transaction.atomic():
+                response = handler(request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    # Saved with the writes it answers for: both commit or neither does.
+                    claim.status_code = response.status_code
+                    claim.response = response.data
+                    claim.save(update_fields=['status_code', 'response'])
+        except Exception:
+            claim.delete()
+            raise
+
+        if not status.is_success(response.status_code):
+            claim.delete()
+        return response
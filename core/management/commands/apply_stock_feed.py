@@ -0,0 +1,34 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from products.feeds import apply_delta_feed
+from products.imports import iter_records
+
+
+class Command(BaseCommand):
+    help = "Apply a CSV or JSONL stock/price delta feed keyed by product slug"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in ('csv', 'jsonl'):
+            raise CommandError('Use --format to choose between csv and jsonl.')
+
+        with open(path, encoding='utf-8', newline='') as stream:
+            report = apply_delta_feed(iter_records(stream, fmt), batch_size=options['batch_size'])
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.received} record(s): {report.changed} changed, {report.unchanged} unchanged, "
+            f"{report.duplicates} duplicate(s), {report.failed} failed in {report.elapsed:.2f}s "
+            f"({report.rows_per_second:.0f} rows/s, lock {report.lock_time * 1000:.0f}ms total, "
+            f"{report.max_lock_time * 1000:.0f}ms max)"
+        ))
@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from rest_framework.exceptions import ValidationError
+
+from carts.models import Cart, CartItem
+from categories.models import Category
+from orders.models import Order, OrderItem
+from orders.services import create_order_from_cart
+from products.models import Product
+
+BENCH_PREFIX = 'bench-checkout'
+
+ADDRESS = {
+    'full_name': 'Benchmark Shopper',
+    'email': 'bench@example.com',
+    'phone_number': '5550000000',
+    'line1': '1 Benchmark Street',
+    'city': 'Istanbul',
+    'district': 'Kadikoy',
+    'postal_code': '34710',
+    'country': 'TR',
+}
+
+
+class Command(BaseCommand):
+    help = "Run concurrent checkouts against scarce stock and verify nothing is oversold"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shoppers', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--products', type=int, default=5)
+        parser.add_argument('--stock', type=int, default=50,
+                            help='Units of each product; keep it below the demand to force contention.')
+        parser.add_argument('--lines', type=int, default=3, help='Products per cart.')
+        parser.add_argument('--max-quantity', type=int, default=3)
+        parser.add_argument('--retries', type=int, default=5,
+                            help='Retries for "database is locked" errors (SQLite).')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete the seeded benchmark data afterwards.')
+
+    def handle(self, *args, **options):
+        self.cleanup()
+        products, users = self.seed(options)
+        initial = {product.pk: product.stock for product in products}
+
+        counts = {'orders': 0, 'rejected': 0, 'locked': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def checkout(user):
+            try:
+                for attempt in range(options['retries'] + 1):
+                    try:
+                        create_order_from_cart(user, ADDRESS)
+                        outcome = 'orders'
+                        break
+                    except ValidationError:
+                        outcome = 'rejected'
+                        break
+                    except OperationalError:
+                        outcome = 'locked'
+                        time.sleep(0.01 * (attempt + 1))
+                else:
+                    outcome = 'failed'
+            finally:
+                connections.close_all()
+            with lock:
+                counts[outcome if outcome != 'locked' else 'failed'] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            list(executor.map(checkout, users))
+        elapsed = time.perf_counter() - started
+
+        sold = {product_id: 0 for product_id in initial}
+        for product_id, quantity in OrderItem.objects.filter(
+            order__user__in=users
+        ).values_list('product_id', 'quantity'):
+            sold[product_id] += quantity
+        final = dict(Product.objects.filter(pk__in=initial).values_list('pk', 'stock'))
+
+        oversold = [
+            product_id for product_id in initial
+            if sold[product_id] > initial[product_id] or final[product_id] != initial[product_id] - sold[product_id]
+        ]
+        self.stdout.write(
+            f"shoppers={len(users)} threads={options['threads']} orders={counts['orders']} "
+            f"rejected={counts['rejected']} failed={counts['failed']} "
+            f"elapsed={elapsed:.2f}s orders/sec={counts['orders'] / elapsed:.1f}"
+        )
+        for product_id in initial:
+            self.stdout.write(
+                f"    product {product_id}: stock {initial[product_id]} -> {final[product_id]}, sold {sold[product_id]}"
+            )
+
+        if options['cleanup']:
+            self.cleanup()
+
+        if oversold:
+            self.stderr.write(self.style.ERROR(f"Stock mismatch for product(s) {oversold}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No oversell: every sold unit came out of stock exactly once"))
+
+    def seed(self, options):
+        rng = random.Random(0)
+        category, _ = Category.objects.get_or_create(
+            slug=f'{BENCH_PREFIX}-cat', defaults={'title': 'Checkout Benchmark'}
+        )
+        products = Product.objects.bulk_create([
+            Product(
+                title=f'Checkout benchmark product {i}',
+                slug=f'{BENCH_PREFIX}-product-{i}',
+                price=Decimal(rng.randint(5, 500)),
+                stock=options['stock'],
+                category=category,
+            )
+            for i in range(options['products'])
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'{BENCH_PREFIX}-{i}') for i in range(options['shoppers'])
+        ])
+        users = list(User.objects.filter(username__startswith=f'{BENCH_PREFIX}-').order_by('pk'))
+        carts = Cart.objects.bulk_create([Cart(user=user) for user in users])
+
+        # Carts are written directly, without reservations, so that demand
+        # exceeds stock and every checkout competes for the same rows.
+        lines = min(options['lines'], len(products))
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product=product, quantity=rng.randint(1, options['max_quantity']))
+            for cart in carts
+            for product in rng.sample(products, lines)
+        ])
+        return products, users
+
+    def cleanup(self):
+        users = User.objects.filter(username__startswith=f'{BENCH_PREFIX}-')
+        Order.objects.filter(user__in=users).delete()
+        users.delete()
+        Product.objects.filter(slug__startswith=f'{BENCH_PREFIX}-').delete()
+        Category.objects.filter(slug__startswith=f'{BENCH_PREFIX}-').delete()
@@ -0,0 +1,132 @@
+import json
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from categories.models import Category
+from products.filters import ProductFilter
+from products.models import Product
+from products.search import get_search_backend
+
+BENCH_PREFIX = 'bench'
+
+FILTER_CASES = [
+    ('active only', {}),
+    ('category', {'category': f'{BENCH_PREFIX}-cat-0'}),
+    ('price lt', {'price__lt': '100'}),
+    ('price range', {'price__range': '100,500'}),
+    ('category + price range', {'category': f'{BENCH_PREFIX}-cat-0', 'price__range': '100,500'}),
+    ('category + price gt', {'category': f'{BENCH_PREFIX}-cat-1', 'price__gt': '1500'}),
+    ('title icontains', {'title__icontains': 'product 42'}),
+    ('full-text search', {'search': 'product 421'}),
+    ('newest first', {'ordering': '-created_at'}),
+    ('category + cheapest first', {'category': f'{BENCH_PREFIX}-cat-2', 'ordering': 'price'}),
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmark ProductFilter lookups and record their query plans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=0,
+                            help='Seed this many benchmark products before running.')
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--output', help='Write the results as JSON to this path.')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete the seeded benchmark catalog afterwards.')
+
+    def handle(self, *args, **options):
+        if options['products']:
+            self.seed(options['products'], options['categories'], options['batch_size'])
+
+        results = []
+        for name, params in FILTER_CASES:
+            results.append(self.run_case(name, params, options['repeat'], options['page_size']))
+
+        for result in results:
+            self.stdout.write(
+                f"{result['name']:<28} rows={result['rows']:<8} "
+                f"median={result['median_ms']:.2f}ms p95={result['p95_ms']:.2f}ms"
+            )
+            for line in result['plan'].splitlines():
+                self.stdout.write(f"    {line}")
+
+        if options['output']:
+            with open(options['output'], 'w') as fp:
+                json.dump({
+                    'vendor': connection.vendor,
+                    'products': Product.objects.count(),
+                    'results': results,
+                }, fp, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options['cleanup']:
+            Product.objects.filter(slug__startswith=f'{BENCH_PREFIX}-').delete()
+            Category.objects.filter(slug__startswith=f'{BENCH_PREFIX}-').delete()
+
+    def seed(self, count, category_count, batch_size):
+        categories = [
+            Category.objects.get_or_create(
+                slug=f'{BENCH_PREFIX}-cat-{i}',
+                defaults={'title': f'Benchmark Category {i}'}
+            )[0]
+            for i in range(category_count)
+        ]
+        start = Product.objects.filter(slug__startswith=f'{BENCH_PREFIX}-').count()
+        rng = random.Random(start)
+
+        batch = []
+        for i in range(start, start + count):
+            batch.append(Product(
+                title=f'Benchmark product {i}',
+                slug=f'{BENCH_PREFIX}-product-{i}',
+                description='Seeded by benchmark_product_filters',
+                price=Decimal(rng.randint(50, 2000)),
+                stock=rng.randint(0, 100),
+                is_active=rng.random() > 0.1,
+                category=rng.choice(categories),
+            ))
+            if len(batch) >= batch_size:
+                get_search_backend().index(Product.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            get_search_backend().index(Product.objects.bulk_create(batch))
+
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        self.stdout.write(self.style.SUCCESS(f"Seeded {count} benchmark products"))
+
+    def build_queryset(self, params):
+        queryset = Product.objects.filter(is_active=True)
+        if 'search' in params:
+            queryset = get_search_backend().filter(queryset, params['search'])
+        return ProductFilter(params, queryset=queryset).qs
+
+    def run_case(self, name, params, repeat, page_size):
+        timings = []
+        rows = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset = self.build_queryset(params)
+            rows = queryset.count()
+            list(queryset[:page_size])
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        return {
+            'name': name,
+            'params': params,
+            'rows': rows,
+            'median_ms': statistics.median(timings),
+            'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            'plan': self.build_queryset(params)[:page_size].explain(),
+        }
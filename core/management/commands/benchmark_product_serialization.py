@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from products.models import Product
+from products.serializers import ProductReadSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare rows/sec of the per-instance and values() product list serializers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/api/products/'))
+        context = {'request': request}
+        queryset = Product.objects.filter(is_active=True).order_by('-created_at')[:options['rows']]
+
+        def per_instance():
+            return serializers.ListSerializer(
+                queryset.all(), child=ProductReadSerializer(), context=context
+            ).data
+
+        def per_instance_joined():
+            return serializers.ListSerializer(
+                queryset.select_related('category'), child=ProductReadSerializer(), context=context
+            ).data
+
+        def values_rows():
+            return ProductReadSerializer(queryset.all(), many=True, context=context).data
+
+        renderer = JSONRenderer()
+        baseline = renderer.render(per_instance())
+        if renderer.render(values_rows()) != baseline:
+            self.stderr.write(self.style.ERROR("values() output differs from ProductReadSerializer"))
+            return
+
+        rows = len(per_instance())
+        for name, func in (
+            ('per-instance', per_instance),
+            ('per-instance + select_related', per_instance_joined),
+            ('values() fast path', values_rows),
+        ):
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries:
+                func()
+            best = float('inf')
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                func()
+                best = min(best, time.perf_counter() - started)
+            self.stdout.write(
+                f"{name:<32} queries={len(queries):<6} "
+                f"{best * 1000:8.2f}ms  {rows / best if best else 0:12.0f} rows/sec"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Outputs identical for {rows} rows"))
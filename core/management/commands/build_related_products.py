@@ -0,0 +1,24 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from products.recommendations import build_related_products
+
+
+class Command(BaseCommand):
+    help = "Build the 'frequently bought together' table from order history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None)
+        parser.add_argument('--min-score', type=int, default=1)
+        parser.add_argument(
+            '--since-hours', type=int, default=None,
+            help="Only recompute products ordered in the last N hours"
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since_hours'] is not None:
+            since = timezone.now() - timedelta(hours=options['since_hours'])
+
+        count = build_related_products(k=options['top_k'], min_score=options['min_score'], since=since)
+        self.stdout.write(self.style.SUCCESS(f"Related products rebuilt for {count} product(s)"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from products.images import generate_product_image_variants
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Generate resized image variants for products that are missing them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate variants for every product.')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['force']:
+            products = products.filter(image_variants={})
+
+        count = 0
+        for product_id in products.values_list('id', flat=True).iterator():
+            generate_product_image_variants(product_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Image variants generated for {count} product(s)"))
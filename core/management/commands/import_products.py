@@ -0,0 +1,41 @@
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from products.imports import import_products, iter_records
+
+
+class Command(BaseCommand):
+    help = "Stream products from a CSV or JSONL file into the catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Validate without inserting.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in ('csv', 'jsonl'):
+            raise CommandError('Use --format to choose between csv and jsonl.')
+
+        def on_error(line, errors):
+            self.stderr.write(f"line {line}: {json.dumps(errors)}")
+
+        started = time.perf_counter()
+        with open(path, encoding='utf-8', newline='') as stream:
+            report = import_products(
+                iter_records(stream, fmt),
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                max_errors=0,
+                on_error=on_error,
+            )
+        elapsed = time.perf_counter() - started
+
+        verb = 'validated' if options['dry_run'] else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.created} product(s) {verb}, {report.failed} failed in {elapsed:.1f}s"
+        ))
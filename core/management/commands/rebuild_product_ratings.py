@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from comments.services import rebuild_product_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute product rating aggregates from all comments"
+
+    def handle(self, *args, **kwargs):
+        count = rebuild_product_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Rating aggregates rebuilt for {count} rated product(s)"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product full-text search index"
+
+    def handle(self, *args, **kwargs):
+        get_search_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS("Product search index rebuilt successfully!"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from carts.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = "Release expired cart stock reservations back to available stock"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        count = release_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Released {count} expired reservation(s)"))
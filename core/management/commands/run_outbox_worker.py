@@ -0,0 +1,41 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver outbox messages to their handlers, retrying failures with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Handlers run at once (default: OUTBOX_WORKERS).')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when no message is due.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no message is due instead of polling.')
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or getattr(settings, 'OUTBOX_WORKERS', 4)
+        claimed_total = delivered_total = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='outbox') as executor:
+            try:
+                while True:
+                    claimed, delivered = process_batch(executor, options['batch_size'])
+                    claimed_total += claimed
+                    delivered_total += delivered
+                    if claimed:
+                        if options['verbosity'] > 1:
+                            self.stdout.write(f"Delivered {delivered} of {claimed} message(s)")
+                        continue
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Delivered {delivered_total} of {claimed_total} claimed outbox message(s)"
+        ))
@@ -1,3 +1,60 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class IdempotencyKey(models.Model):
+    """The first response to a request sent with an Idempotency-Key header."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    # sha256 of method, path and body; a reused key must resend the same request.
+    fingerprint = models.CharField(max_length=64)
+    # None while the first request is still running.
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True)
+    # When the running request claimed the key; an old unfinished claim is
+    # taken over by the next retry.
+    claimed_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'key')
+        indexes = [models.Index(fields=['expires_at'], name='idempotency_expires_idx')]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key}"
+
+
+class OutboxMessage(models.Model):
+    """
+    A side effect of an order or payment change, written in the same
+    transaction and delivered afterwards by run_outbox_worker.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('delivered', 'Delivered'),
+        ('failed', 'Failed'),
+    ]
+
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    # Not claimed before this time: creation, or the next retry after backoff.
+    available_at = models.DateTimeField()
+    # Set while a worker holds the message; a crashed worker's lease runs out
+    # and the message is claimed again.
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['available_at'], condition=models.Q(status='pending'),
+                         name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk}"
@@ -0,0 +1,122 @@
+import logging
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+_handlers = None
+
+
+def publish(topic, payload):
+    """
+    Queue `payload` for the handlers of `topic`. Call it inside the
+    transaction that makes the change: the message commits with it or not
+    at all, and costs the request one INSERT.
+    """
+    return OutboxMessage.objects.create(topic=topic, payload=payload, available_at=timezone.now())
+
+
+def get_handlers(topic):
+    global _handlers
+    if _handlers is None:
+        _handlers = {
+            name: [import_string(path) for path in paths]
+            for name, paths in getattr(settings, 'OUTBOX_HANDLERS', {}).items()
+        }
+    return _handlers.get(topic, [])
+
+
+def log_message(message):
+    logger.info(f"Outbox {message.topic} #{message.pk}: {message.payload}")
+
+
+def get_retry_delay(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_DELAY', 10)
+    cap = getattr(settings, 'OUTBOX_RETRY_MAX_DELAY', 60 * 60)
+    # Jitter keeps messages that failed together from retrying together.
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap) * random.uniform(0.5, 1))
+
+
+def claim(batch_size):
+    """
+    Lease up to `batch_size` due messages to this worker for OUTBOX_LEASE
+    seconds. Other workers skip rows locked by a concurrent claim where the
+    database supports it; on SQLite the claim's write transaction already
+    runs alone.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'OUTBOX_LEASE', 5 * 60))
+    with transaction.atomic():
+        due = OutboxMessage.objects.filter(
+            Q(locked_until__isnull=True) | Q(locked_until__lte=now),
+            status='pending', available_at__lte=now,
+        ).order_by('available_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        OutboxMessage.objects.filter(id__in=ids).update(locked_until=now + lease, attempts=F('attempts') + 1)
+    return list(OutboxMessage.objects.filter(id__in=ids).order_by('available_at', 'id'))
+
+
+def deliver(message):
+    """Run every handler of the message's topic. Returns the error, or '' on success."""
+    try:
+        for handler in get_handlers(message.topic):
+            handler(message)
+        return ''
+    except Exception as e:
+        logger.exception(f"Outbox delivery failed for {message.topic} #{message.pk}")
+        return f"{type(e).__name__}: {e}"
+
+
+def deliver_in_worker(message):
+    try:
+        return deliver(message)
+    finally:
+        # Handlers may have opened connections on this pool thread.
+        connections.close_all()
+
+
+def settle(messages, errors):
+    now = timezone.now()
+    delivered = [message.pk for message, error in zip(messages, errors) if not error]
+    OutboxMessage.objects.filter(pk__in=delivered).update(
+        status='delivered', delivered_at=now, locked_until=None, last_error=''
+    )
+
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 10)
+    for message, error in zip(messages, errors):
+        if not error:
+            continue
+        if message.attempts >= max_attempts:
+            OutboxMessage.objects.filter(pk=message.pk).update(status='failed', locked_until=None, last_error=error)
+        else:
+            OutboxMessage.objects.filter(pk=message.pk).update(
+                available_at=now + get_retry_delay(message.attempts), locked_until=None, last_error=error
+            )
+    return len(delivered)
+
+
+def process_batch(executor=None, batch_size=None):
+    """
+    Claim one batch and deliver it, on `executor`'s threads if given. A
+    message is only marked delivered after its handlers returned, so a crash
+    in between means it is delivered again once the lease runs out: handlers
+    must tolerate duplicates. Returns (claimed, delivered).
+    """
+    messages = claim(batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 100))
+    if not messages:
+        return 0, 0
+    if executor is None:
+        errors = [deliver(message) for message in messages]
+    else:
+        errors = list(executor.map(deliver_in_worker, messages))
+    return len(messages), settle(messages, errors)
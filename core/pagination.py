@@ -1,6 +1,167 @@
-from rest_framework.pagination import PageNumberPagination
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination, _reverse_ordering
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+
+class StandardCursorPagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+    ordering_query_param = 'ordering'
+
+    def get_ordering(self, request, queryset, view):
+        # Views opt in to extra keys with `cursor_ordering_fields`; `id` is
+        # always appended as the tie-breaker so the cursor stays stable.
+        allowed = getattr(view, 'cursor_ordering_fields', ('created_at',))
+        param = request.query_params.get(self.ordering_query_param, '')
+        field = param.lstrip('-')
+
+        if field in allowed:
+            direction = '-' if param.startswith('-') else ''
+            return (f'{direction}{field}', f'{direction}id')
+        return self.ordering
+
+    def _get_position_from_instance(self, instance, ordering):
+        # The position is the (key, id) pair, so a cursor points at exactly
+        # one row however many rows share the key.
+        get_position = super()._get_position_from_instance
+        return '|'.join(get_position(instance, (field,)) for field in ordering)
+
+    def get_keyset_filter(self, ordering, position):
+        """Rows after `position` in `ordering`: (key, id) compared as a pair."""
+        try:
+            value, pk = position.rsplit('|', 1)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        key, tie_breaker = ordering
+        key_lookup = f"{key.lstrip('-')}__{'lt' if key.startswith('-') else 'gt'}"
+        tie_lookup = f"{tie_breaker.lstrip('-')}__{'lt' if tie_breaker.startswith('-') else 'gt'}"
+        return Q(**{key_lookup: value}) | Q(**{key.lstrip('-'): value, tie_lookup: pk})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        DRF's CursorPagination filters on the first ordering key alone and
+        steps over equal keys with an OFFSET, which scans long runs of ties
+        and loses previous links inside them. Filtering on the whole
+        (key, id) position makes every page a single keyset comparison.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, current_position))
+
+        # One extra row tells whether another page follows.
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering)
+            if len(results) > self.page_size else None
+        )
+
+        has_current = current_position is not None or offset > 0
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = has_current, current_position
+            self.has_previous, self.previous_position = following_position is not None, following_position
+        else:
+            self.has_next, self.next_position = following_position is not None, following_position
+            self.has_previous, self.previous_position = has_current, current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def paginate_first_page(self, results, request, base_url):
+        """
+        Paginate rows that were already loaded (e.g. by a sliced Prefetch) as
+        the first `page_size + 1` in `ordering`, so get_next_link() can hand
+        out a cursor for `base_url` without another query.
+        """
+        self.request = request
+        self.base_url = base_url
+        self.cursor = None
+        self.page = list(results[:self.page_size])
+        self.has_previous = False
+        self.has_next = len(results) > self.page_size
+        self.next_position = (
+            self._get_position_from_instance(results[self.page_size], self.ordering)
+            if self.has_next else None
+        )
+        return self.page
+
+
+class CursorOrPageNumberPagination(BasePagination):
+    """
+    Page-number pagination by default; switches to keyset pagination (no
+    COUNT, no OFFSET scan) for `?pagination=cursor` or when a `cursor` is sent.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    cursor_pagination_class = StandardCursorPagination
+    page_number_pagination_class = StandardResultsSetPagination
+
+    def __init__(self):
+        self.cursor_paginator = self.cursor_pagination_class()
+        self.page_number_paginator = self.page_number_pagination_class()
+        self.paginator = self.page_number_paginator
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, 'display_page_controls', False)
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == self.cursor_mode
+            or self.cursor_paginator.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.paginator = self.cursor_paginator
+        else:
+            self.paginator = self.page_number_paginator
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_paginator.get_paginated_response_schema(schema)
+
+    def get_results(self, data):
+        return self.paginator.get_results(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [{
+            'name': self.mode_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Set to "cursor" for keyset pagination without a total count.',
+            'schema': {'type': 'string', 'enum': [self.cursor_mode]},
+        }]
+        seen = {self.mode_query_param}
+        for paginator in (self.page_number_paginator, self.cursor_paginator):
+            for parameter in paginator.get_schema_operation_parameters(view):
+                if parameter['name'] not in seen:
+                    seen.add(parameter['name'])
+                    parameters.append(parameter)
+        return parameters
@@ -1,3 +1,400 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from carts.services import add_product_to_cart
+from categories.models import Category
+from orders.models import Order, OrderItem
+from orders.serializers import OrderSerializer
+from orders.services import create_order_from_cart
+from products.models import Product
+from .cache import GENERATION_KEY
+from .checks import check_shared_cache
+from .fieldsets import get_sparse_queryset
+from . import outbox
+from .idempotency import REPLAYED_HEADER
+from .models import IdempotencyKey, OutboxMessage
 
-# Create your tests here.
+ORDER_ADDRESS = {
+    'full_name': 'Test Shopper', 'email': 'shopper@example.com', 'phone_number': '5550000000',
+    'line1': '1 Test Street', 'city': 'Istanbul', 'district': 'Kadikoy', 'postal_code': '34710', 'country': 'TR',
+}
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class CatalogCacheInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        self.product = Product.objects.create(
+            title='Running shoe', slug='running-shoe', price=Decimal('10.00'), stock=5, category=category
+        )
+
+    def get_price(self):
+        response = self.client.get('/api/products/')
+        return response.data['results'][0]['price']
+
+    def test_generation_bump_from_another_process_invalidates_cached_list(self):
+        self.assertEqual(self.get_price(), '10.00')
+
+        # A bulk write that skips signals is served from the cache until the
+        # generation moves.
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('25.00'))
+        self.assertEqual(self.get_price(), '10.00')
+
+        # Another process (a management command, another worker) has its own
+        # cache connection; its bump has to reach this one.
+        other_process = caches.create_connection('default')
+        other_process.incr(GENERATION_KEY.format('products.Product'))
+        self.assertEqual(self.get_price(), '25.00')
+
+    def test_process_local_cache_is_rejected(self):
+        self.assertEqual(check_shared_cache(None), [])
+        with override_settings(CACHES=LOCMEM):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['core.E001'])
+        with override_settings(CACHES=LOCMEM, CATALOG_CACHE_TIMEOUT=0):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        product = Product.objects.create(
+            title='Running shoe', slug='running-shoe', price=Decimal('10.00'), stock=5, category=category
+        )
+        self.order = Order.objects.create(
+            user=self.user, full_name='Test Shopper', email='shopper@example.com', phone_number='5550000000',
+            line1='1 Test Street', city='Istanbul', district='Kadikoy', postal_code='34710', country='TR',
+            order_total=Decimal('10.00'),
+        )
+        OrderItem.objects.create(order=self.order, product=product, quantity=1, price=product.price)
+        self.url = f'/api/orders/payment/{self.order.pk}/'
+
+    def pay(self, key='key-1', data=None):
+        return self.client.post(self.url, data or {}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.pay()
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn(REPLAYED_HEADER, first)
+
+        # Without the key the order is no longer pending and this would be a 400.
+        second = self.pay()
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second[REPLAYED_HEADER], 'true')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(self.pay(key='key-2').status_code, 400)
+
+    def test_key_reused_with_a_different_body(self):
+        self.pay()
+        self.assertEqual(self.pay(data={'card': '4242'}).status_code, 422)
+
+    @override_settings(IDEMPOTENCY_WAIT=0)
+    def test_in_flight_claim_conflicts(self):
+        self.pay()
+        IdempotencyKey.objects.update(status_code=None, response=None)
+        self.assertEqual(self.pay().status_code, 409)
+
+    @override_settings(IDEMPOTENCY_WAIT=0)
+    def test_stale_claim_is_taken_over(self):
+        self.pay()
+        # A worker died mid-request: the claim never finished and nothing was paid.
+        IdempotencyKey.objects.update(
+            status_code=None, response=None, claimed_at=timezone.now() - timedelta(minutes=5)
+        )
+        Order.objects.filter(pk=self.order.pk).update(status='pending')
+
+        response = self.pay()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(REPLAYED_HEADER, response)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 200)
+
+    def test_failed_request_releases_the_key(self):
+        Order.objects.filter(pk=self.order.pk).update(status='shipped')
+        self.assertEqual(self.pay().status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_side_effect_commits_with_the_stored_response(self):
+        save = IdempotencyKey.save
+
+        def fail_on_response(record, *args, **kwargs):
+            if 'response' in kwargs.get('update_fields', ()):
+                raise DatabaseError('disk full')
+            return save(record, *args, **kwargs)
+
+        with mock.patch.object(IdempotencyKey, 'save', fail_on_response):
+            self.assertEqual(self.pay().status_code, 500)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'pending')
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        # The retry runs the payment for real.
+        self.assertEqual(self.pay().status_code, 200)
+        self.order.refresh_from_db()
+        self.assertNotEqual(self.order.status, 'pending')
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        self.first, self.second = Product.objects.bulk_create([
+            Product(title=title, slug=title.lower(), price=Decimal('10.00'), stock=5, category=category)
+            for title in ('First', 'Second')
+        ])
+
+    def test_list_is_revalidated_with_the_etag_only(self):
+        response = self.client.get('/api/products/')
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # A delete leaves MAX(updated_at) where it was; the ETag still moves.
+        since = http_date(time.time() + 60)
+        self.first.delete()
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_honours_if_modified_since(self):
+        url = f'/api/products/{self.second.pk}/'
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.delivered = []
+        self.handlers = mock.patch.object(outbox, '_handlers', {'test': [self.record]})
+        self.handlers.start()
+        self.addCleanup(self.handlers.stop)
+
+    def record(self, message):
+        self.delivered.append(message.payload['n'])
+
+    def publish(self, count):
+        for n in range(count):
+            outbox.publish('test', {'n': n})
+
+    def test_order_rollback_publishes_nothing(self):
+        user = User.objects.create_user('shopper', password='pw')
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        product = Product.objects.create(
+            title='Running shoe', slug='running-shoe', price=Decimal('10.00'), stock=5, category=category
+        )
+        add_product_to_cart(user, product.pk, 2)
+        Product.objects.filter(pk=product.pk).update(stock=1)
+
+        with self.assertRaises(ValidationError):
+            create_order_from_cart(user, ORDER_ADDRESS)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+        Product.objects.filter(pk=product.pk).update(stock=5)
+        order = create_order_from_cart(user, ORDER_ADDRESS)
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.topic, message.payload['order_id']), ('order.created', order.pk))
+
+    def test_each_message_is_delivered_once(self):
+        self.publish(5)
+        self.assertEqual(outbox.process_batch(batch_size=3), (3, 3))
+        self.assertEqual(outbox.process_batch(batch_size=3), (2, 2))
+        self.assertEqual(outbox.process_batch(batch_size=3), (0, 0))
+        self.assertEqual(sorted(self.delivered), [0, 1, 2, 3, 4])
+        self.assertEqual(OutboxMessage.objects.filter(status='delivered').count(), 5)
+
+    def test_leased_messages_are_not_claimed_twice(self):
+        self.publish(2)
+        self.assertEqual(len(outbox.claim(10)), 2)
+        self.assertEqual(outbox.claim(10), [])
+
+        # The worker died; once the lease runs out the messages come back.
+        OutboxMessage.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(outbox.process_batch(), (2, 2))
+        self.assertEqual(list(OutboxMessage.objects.values_list('attempts', flat=True)), [2, 2])
+
+    def test_failed_handler_is_retried_with_backoff(self):
+        failures = iter([RuntimeError('ERP is down')])
+
+        def flaky(message):
+            error = next(failures, None)
+            if error:
+                raise error
+            self.record(message)
+
+        outbox._handlers['test'] = [flaky]
+        self.publish(1)
+        self.assertEqual(outbox.process_batch(), (1, 0))
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertIn('ERP is down', message.last_error)
+        self.assertGreater(message.available_at, timezone.now())
+
+        # Not due before the backoff runs out.
+        self.assertEqual(outbox.process_batch(), (0, 0))
+        OutboxMessage.objects.update(available_at=timezone.now())
+        self.assertEqual(outbox.process_batch(), (1, 1))
+        self.assertEqual(self.delivered, [0])
+        self.assertEqual(OutboxMessage.objects.get().status, 'delivered')
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_DELAY=0)
+    def test_message_fails_after_max_attempts(self):
+        outbox._handlers['test'] = [lambda message: 1 / 0]
+        self.publish(1)
+        outbox.process_batch()
+        outbox.process_batch()
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.status, message.attempts), ('failed', 2))
+        self.assertEqual(outbox.process_batch(), (0, 0))
+
+    def test_worker_command_drains_the_outbox(self):
+        self.publish(30)
+        call_command('run_outbox_worker', once=True, workers=4, batch_size=7, stdout=StringIO())
+        self.assertEqual(sorted(self.delivered), list(range(30)))
+        self.assertFalse(OutboxMessage.objects.exclude(status='delivered').exists())
+
+
+@override_settings(CACHES=LOCMEM)
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        products = Product.objects.bulk_create([
+            Product(title=f'Shoe {i}', slug=f'shoe-{i}', price=Decimal('10.00'), stock=5, category=category)
+            for i in range(2)
+        ])
+        self.order = Order.objects.create(user=self.user, **ORDER_ADDRESS)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=self.order, product=product, quantity=1, price=product.price) for product in products
+        ])
+        self.url = f'/api/orders/{self.order.pk}/'
+
+    def get(self, params, queries):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), queries)
+        return response.data, [query['sql'] for query in context.captured_queries]
+
+    def test_unselected_columns_and_relations_are_not_loaded(self):
+        data, (sql,) = self.get({'fields': 'id,status'}, queries=1)
+        self.assertEqual(set(data), {'id', 'status'})
+        self.assertNotIn('full_name', sql)
+        self.assertNotIn('auth_user', sql)
+
+        data, (_, items_sql) = self.get({'fields': 'id,items.quantity'}, queries=2)
+        self.assertEqual([set(item) for item in data['items']], [{'quantity'}, {'quantity'}])
+        self.assertNotIn('products_product', items_sql)
+
+        # Selected relations are joined or prefetched, never loaded per row.
+        data, (order_sql, items_sql) = self.get({'fields': 'user,items.product.category'}, queries=2)
+        self.assertIn('auth_user', order_sql)
+        self.assertNotIn('password', order_sql)
+        self.assertIn('categories_category', items_sql)
+        self.assertNotIn('description', items_sql)
+        self.assertEqual([item['product'] for item in data['items']], [{'category': 'Shoes'}] * 2)
+
+    def test_nested_fields_and_omit(self):
+        data, _ = self.get({'fields': 'id,items.product.title'}, queries=2)
+        self.assertEqual(set(data), {'id', 'items'})
+        self.assertEqual([item['product'] for item in data['items']], [{'title': 'Shoe 0'}, {'title': 'Shoe 1'}])
+
+        data, _ = self.get({'omit': 'items.product,delivery_address'}, queries=2)
+        self.assertNotIn('delivery_address', data)
+        self.assertEqual(set(data['items'][0]), {'id', 'quantity', 'price'})
+
+    def test_unknown_field_names_are_ignored(self):
+        data, _ = self.get({'fields': 'status,bogus,items.bogus'}, queries=2)
+        self.assertEqual(set(data), {'status', 'items'})
+        self.assertEqual(data['items'], [{}, {}])
+        data, _ = self.get({'omit': 'bogus'}, queries=2)
+        self.assertIn('delivery_address', data)
+
+    def test_queryset_plan(self):
+        queryset = get_sparse_queryset(Order.objects.all(), OrderSerializer(fields='status,items.quantity'))
+        self.assertEqual(queryset.query.deferred_loading, ({'status'}, False))
+        self.assertEqual(queryset.query.select_related, False)
+        (prefetch,) = queryset._prefetch_related_lookups
+        self.assertEqual(prefetch.prefetch_through, 'items')
+        self.assertEqual(prefetch.queryset.query.deferred_loading, ({'quantity', 'order_id'}, False))
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        self.products = Product.objects.bulk_create([
+            Product(title=f'Shoe {i}', slug=f'shoe-{i}', price=Decimal('10.00'), stock=5, category=category)
+            for i in range(5)
+        ])
+        # Every row ties on both ordering keys; only the id tells them apart.
+        Product.objects.update(created_at=timezone.now())
+
+    def titles(self, response):
+        return [row['title'] for row in response.data['results']]
+
+    def walk(self, params):
+        response = self.client.get('/api/products/', {'pagination': 'cursor', 'page_size': 2, **params})
+        pages = [self.titles(response)]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append(self.titles(response))
+        return pages
+
+    def test_cursor_pages_break_ties_by_id(self):
+        newest_first = [f'Shoe {i}' for i in reversed(range(5))]
+        self.assertEqual(self.walk({}), [newest_first[:2], newest_first[2:4], newest_first[4:]])
+        self.assertEqual(sum(self.walk({'ordering': 'price'}), []), newest_first[::-1])
+        self.assertEqual(sum(self.walk({'ordering': '-price'}), []), newest_first)
+
+    def test_cursor_previous_link(self):
+        first = self.client.get('/api/products/', {'pagination': 'cursor', 'page_size': 2})
+        self.assertIsNone(first.data['previous'])
+        self.assertNotIn('count', first.data)
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(self.titles(back), self.titles(first))
+
+    def test_page_numbers_by_default(self):
+        response = self.client.get('/api/products/', {'page_size': 2, 'page': 2})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn('page=3', response.data['next'])
+        self.assertIn('cursor=', self.client.get('/api/products/', {'pagination': 'cursor', 'page_size': 2}).data['next'])
+
+    def test_unknown_ordering(self):
+        self.assertEqual(self.client.get('/api/products/', {'ordering': 'stock'}).status_code, 400)
+
+        # Lists without an ordering filter page newest first instead.
+        user = User.objects.create_user('shopper', password='pw')
+        orders = Order.objects.bulk_create([Order(user=user, **ORDER_ADDRESS) for _ in range(3)])
+        Order.objects.update(created_at=timezone.now())
+        self.client.force_authenticate(user)
+        for ordering in ('status', '-order_total', 'id;drop'):
+            response = self.client.get('/api/orders/', {'pagination': 'cursor', 'page_size': 2, 'ordering': ordering})
+            ids = [row['id'] for row in response.data['results']]
+            ids += [row['id'] for row in self.client.get(response.data['next']).data['results']]
+            self.assertEqual(ids, [order.pk for order in reversed(orders)], ordering)
+
+    def test_malformed_cursor_is_not_found(self):
+        response = self.client.get('/api/products/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
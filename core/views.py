@@ -20,6 +20,7 @@ def api_root(request, fmt=None):
         'cart': {
             'detail': reverse('cart_detail', request=request, format=fmt),
             'add_item': reverse('cart_add', request=request, format=fmt),
+            'batch': reverse('cart_batch', request=request, format=fmt),
             'clear': reverse('cart_clear', request=request, format=fmt),
         },
         'orders': {
@@ -32,6 +32,11 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Order history pages: one user's orders, newest first.
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import Order, OrderItem
 from products.serializers import ProductReadSerializer
 from typing import Dict
+from core.fieldsets import SparseFieldsetMixin
 
 class OrderCreateSerializer(serializers.Serializer):
     full_name = serializers.CharField(max_length=120)
@@ -14,7 +15,7 @@ class OrderCreateSerializer(serializers.Serializer):
     postal_code = serializers.CharField(max_length=20)
     country = serializers.CharField(max_length=50)
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product = ProductReadSerializer(read_only=True)
 
     class Meta:
@@ -26,11 +27,20 @@ class OrderStatusUpdateSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['status']
 
-class OrderSerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField()
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # Reads only auth_user.username instead of the whole row (password hash
+    # included) that StringRelatedField's str(user) needs.
+    user = serializers.CharField(source='user.username', read_only=True)
     items = OrderItemSerializer(many=True, read_only=True)
     delivery_address = serializers.SerializerMethodField()
 
+    field_dependencies = {
+        'delivery_address': (
+            'full_name', 'email', 'phone_number', 'line1', 'line2',
+            'city', 'district', 'postal_code', 'country',
+        ),
+    }
+
     class Meta:
         model = Order
         fields = ["id", "user", "created_at", "updated_at", "status", "order_total", "items", "delivery_address"
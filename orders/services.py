@@ -1,14 +1,30 @@
 from rest_framework.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import F
 from .models import Order, OrderItem
-from products.services import check_product_stock, decrease_product_stock
+from products.services import take_stock
+from carts.models import Cart
+from carts.services import checkout_cart
+from carts.reservations import consume
+from core.outbox import publish
 
-@transaction.atomic
-def create_order_from_cart(user, cart, address_data):
-    cart_items = cart.items.select_related("product").all()
+def create_order_from_cart(user, address_data):
+    # The cart store flushes pending writes and holds the cart until the
+    # order is committed, so the order sees one consistent set of lines.
+    with checkout_cart(user) as cart, transaction.atomic():
+        return build_order(user, cart, address_data)
+
+def build_order(user, cart, address_data):
+    cart_items = list(cart.items.select_related("product").order_by("product_id"))
     if not cart_items:
         raise ValidationError("Your cart is empty.")
 
+    quantities = {item.product_id: item.quantity for item in cart_items}
+    # Units held for this cart become the order's; anything that expired
+    # has to be free again.
+    consume(user, quantities)
+    take_stock(quantities)
+
     order = Order.objects.create(
         user=user,
         full_name=address_data.get("full_name"),
@@ -20,23 +36,24 @@ def create_order_from_cart(user, cart, address_data):
         district=address_data.get("district"),
         postal_code=address_data.get("postal_code"),
         country=address_data.get("country"),
-        payment_method="mock"
+        payment_method="mock",
+        order_total=sum(item.quantity * item.product.price for item in cart_items),
     )
-
-    for item in cart_items:
-        check_product_stock(item.product, item.quantity)
-        OrderItem.objects.create(
-            order=order,
-            product=item.product,
-            quantity=item.quantity,
-            price=item.product.price
-        )
-        decrease_product_stock(item.product, item.quantity)
-
-    total = sum([oi.quantity * oi.price for oi in order.items.all()])
-    order.order_total = total
-    order.save()
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=item.product, quantity=item.quantity, price=item.product.price)
+        for item in cart_items
+    ])
+    publish("order.created", {
+        "order_id": order.id,
+        "user_id": user.id,
+        "order_total": str(order.order_total),
+        "items": [
+            {"product_id": item.product_id, "quantity": item.quantity, "price": str(item.product.price)}
+            for item in cart_items
+        ],
+    })
 
     cart.items.all().delete()
+    Cart.objects.filter(pk=cart.pk).update(version=F("version") + 1, total=0)
 
-    return order
\ No newline at end of file
+    return order
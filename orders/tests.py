@@ -1,3 +1,135 @@
-from django.test import TestCase
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from carts.models import CartItem
+from carts.services import add_product_to_cart
+from categories.models import Category
+from products.models import Product
+from .models import Order, OrderItem
+from .services import create_order_from_cart
 
-# Create your tests here.
+ADDRESS = {
+    'full_name': 'Test Shopper',
+    'email': 'shopper@example.com',
+    'phone_number': '5550000000',
+    'line1': '1 Test Street',
+    'city': 'Istanbul',
+    'district': 'Kadikoy',
+    'postal_code': '34710',
+    'country': 'TR',
+}
+
+
+class OrderTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(title='Shoes', slug='shoes')
+        self.products = Product.objects.bulk_create([
+            Product(title=f'Product {i}', slug=f'product-{i}', price=Decimal(10 + i), stock=5, category=self.category)
+            for i in range(3)
+        ])
+
+    def create_orders(self, count, user=None):
+        orders = Order.objects.bulk_create([Order(user=user or self.user, **ADDRESS) for _ in range(count)])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for order in orders
+            for product in self.products
+        ])
+
+
+# Throttle counters live in the cache; keep them out of the query counts.
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class OrderListQueryTests(OrderTestCase):
+    def test_order_list_query_count_is_constant(self):
+        # Cursor pages: orders joined with the user, then one prefetch of the
+        # items with their products and categories.
+        self.create_orders(5)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/', {'pagination': 'cursor', 'page_size': 5})
+        self.assertEqual(len(response.data['results']), 5)
+
+        self.create_orders(35)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/', {'pagination': 'cursor', 'page_size': 40})
+        self.assertEqual(len(response.data['results']), 40)
+
+    def test_order_list_page_number_query_count_is_constant(self):
+        # Page numbers add the COUNT query.
+        self.create_orders(5)
+        with self.assertNumQueries(3):
+            self.client.get('/api/orders/', {'page_size': 5})
+
+        self.create_orders(35)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/orders/', {'page_size': 40})
+        self.assertEqual(len(response.data['results']), 40)
+
+    def test_admin_order_list_query_count_is_constant(self):
+        admin = User.objects.create_superuser('admin', password='pw')
+        self.client.force_authenticate(admin)
+        other = User.objects.create_user('other', password='pw')
+
+        self.create_orders(5, user=other)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/orders/admin/', {'page_size': 5})
+        self.assertEqual(len(response.data['results']), 5)
+
+        self.create_orders(35)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/orders/admin/', {'page_size': 40})
+        self.assertEqual(len(response.data['results']), 40)
+        self.assertTrue(all(len(order['items']) == 3 for order in response.data['results']))
+
+
+class CheckoutStockTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.shoe, self.sock = self.products[:2]
+
+    def stock(self):
+        return dict(Product.objects.filter(pk__in=[self.shoe.pk, self.sock.pk]).values_list('pk', 'stock'))
+
+    def test_checkout_takes_stock_and_empties_the_cart(self):
+        add_product_to_cart(self.user, self.shoe.pk, 3)
+        add_product_to_cart(self.user, self.sock.pk, 1)
+        order = create_order_from_cart(self.user, ADDRESS)
+
+        self.assertEqual(order.order_total, 3 * self.shoe.price + self.sock.price)
+        self.assertEqual(self.stock(), {self.shoe.pk: 2, self.sock.pk: 4})
+        self.assertFalse(Product.objects.filter(reserved__gt=0).exists())
+        self.assertFalse(CartItem.objects.filter(cart__user=self.user).exists())
+
+    def test_lost_stock_update_rolls_the_whole_order_back(self):
+        add_product_to_cart(self.user, self.shoe.pk, 3)
+        add_product_to_cart(self.user, self.sock.pk, 1)
+        # Stock changed under the cart (e.g. a feed), so the conditional
+        # UPDATE matches the sock but not the shoe.
+        Product.objects.filter(pk=self.shoe.pk).update(stock=2)
+
+        with self.assertRaises(ValidationError):
+            create_order_from_cart(self.user, ADDRESS)
+
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(), {self.shoe.pk: 2, self.sock.pk: 5})
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 2)
+
+    @override_settings(CART_RESERVATION_TTL=0)
+    def test_competing_checkouts_cannot_oversell(self):
+        other = User.objects.create_user('other', password='pw')
+        for user in (self.user, other):
+            add_product_to_cart(user, self.shoe.pk, 3)
+            add_product_to_cart(user, self.sock.pk, 1)
+
+        create_order_from_cart(other, ADDRESS)
+        with self.assertRaises(ValidationError):
+            create_order_from_cart(self.user, ADDRESS)
+
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.stock(), {self.shoe.pk: 2, self.sock.pk: 4})
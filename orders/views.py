@@ -5,10 +5,12 @@ from rest_framework.views import APIView
 from drf_spectacular.utils import extend_schema_view, extend_schema
 from drf_spectacular.types import OpenApiTypes
 from . import serializers as order_serializers
-from carts.services import get_cart_or_create
 from .services import create_order_from_cart
 from .models import Order
 from payments.services import create_payment
+from core.pagination import CursorOrPageNumberPagination
+from core.fieldsets import SparseQuerysetMixin, SPARSE_FIELDSET_PARAMETERS
+from core.idempotency import IdempotentMixin, IDEMPOTENCY_KEY_PARAMETER
 
 class MockPaymentSerializer(serializers.Serializer):
     pass
@@ -18,26 +20,32 @@ class MockPaymentSerializer(serializers.Serializer):
         summary="Create Order",
         description="Creates a new order from the authenticated user's current cart. "
                     "Requires shipping/billing address data. "
-                    "Upon success, the cart is cleared and an order with 'pending' status is created.",
+                    "Upon success, the cart is cleared and an order with 'pending' status is created. "
+                    "Send an Idempotency-Key header to retry safely without creating a second order.",
         tags=["Orders"],
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         responses={
             201: OpenApiTypes.OBJECT,
             400: OpenApiTypes.OBJECT,
+            409: OpenApiTypes.OBJECT,
+            422: OpenApiTypes.OBJECT,
             500: OpenApiTypes.OBJECT,
         },
     )
 )
-class CreateOrderView(generics.CreateAPIView):
+class CreateOrderView(IdempotentMixin, generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = order_serializers.OrderCreateSerializer
 
     def create(self, request, *args, **kwargs):
+        return self.idempotent_response(self.create_order, request)
+
+    def create_order(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         address_data = serializer.validated_data
-        cart = get_cart_or_create(request.user)
         try:
-            order = create_order_from_cart(request.user, cart, address_data)
+            order = create_order_from_cart(request.user, address_data)
         except ValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
@@ -50,14 +58,16 @@ class CreateOrderView(generics.CreateAPIView):
         summary="List My Orders",
         description="Returns a list of orders belonging to the authenticated user.",
         tags=["Orders"],
+        parameters=SPARSE_FIELDSET_PARAMETERS,
     )
 )
-class OrderListView(generics.ListAPIView):
+class OrderListView(SparseQuerysetMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = order_serializers.OrderSerializer
+    pagination_class = CursorOrPageNumberPagination
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return self.get_sparse_queryset(Order.objects.filter(user=self.request.user))
 
 @extend_schema_view(
     get=extend_schema(
@@ -65,24 +75,27 @@ class OrderListView(generics.ListAPIView):
         description="Returns a list of all orders in the system. "
                     "Admin only. Optional query parameter: ?userId=<id> to filter by user.",
         tags=["Orders"],
+        parameters=SPARSE_FIELDSET_PARAMETERS,
     )
 )
-class AdminOrderListView(generics.ListAPIView):
+class AdminOrderListView(SparseQuerysetMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAdminUser]
     serializer_class = order_serializers.OrderSerializer
+    pagination_class = CursorOrPageNumberPagination
 
     def get_queryset(self):
         queryset = Order.objects.all()
         user_id = self.request.query_params.get("userId")
         if user_id:
             queryset = queryset.filter(user__id=user_id)
-        return queryset
+        return self.get_sparse_queryset(queryset)
 
 @extend_schema_view(
     get=extend_schema(
         summary="Retrieve Order Detail (Admin)",
         description="Retrieves detailed information for any order by ID. Admin only.",
         tags=["Orders"],
+        parameters=SPARSE_FIELDSET_PARAMETERS,
     ),
     put=extend_schema(
         summary="Update Order Status (Admin)",
@@ -95,12 +108,14 @@ class AdminOrderListView(generics.ListAPIView):
         tags=["Orders"],
     ),
 )
-class AdminOrderDetailView(generics.RetrieveUpdateAPIView):
-    queryset = Order.objects.all()
+class AdminOrderDetailView(SparseQuerysetMixin, generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAdminUser]
     serializer_class = order_serializers.OrderSerializer
     lookup_url_kwarg = "order_id"
 
+    def get_queryset(self):
+        return self.get_sparse_queryset(Order.objects.all())
+
     def get_serializer_class(self):
         if self.request.method in ["PUT", "PATCH"]:
             return order_serializers.OrderStatusUpdateSerializer
@@ -111,33 +126,41 @@ class AdminOrderDetailView(generics.RetrieveUpdateAPIView):
         summary="Retrieve My Order Detail",
         description="Returns detailed information for a specific order belonging to the authenticated user.",
         tags=["Orders"],
+        parameters=SPARSE_FIELDSET_PARAMETERS,
     )
 )
-class OrderDetailView(generics.RetrieveAPIView):
+class OrderDetailView(SparseQuerysetMixin, generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = order_serializers.OrderSerializer
     lookup_url_kwarg = "order_id"
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return self.get_sparse_queryset(Order.objects.filter(user=self.request.user))
 
 @extend_schema(
     summary="Process Mock Payment",
     description="Simulates payment processing for a pending order. "
                 "Only works on orders with 'pending' status and belonging to the authenticated user. "
-                "Upon success, updates order status accordingly (e.g., to 'processing').",
+                "Upon success, updates order status accordingly (e.g., to 'processing'). "
+                "Send an Idempotency-Key header to retry safely and get the original result back.",
     tags=["Orders"],
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     responses={
         200: OpenApiTypes.OBJECT,
         400: OpenApiTypes.OBJECT,
         404: OpenApiTypes.OBJECT,
+        409: OpenApiTypes.OBJECT,
+        422: OpenApiTypes.OBJECT,
     },
 )
-class MockPaymentView(APIView):
+class MockPaymentView(IdempotentMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = MockPaymentSerializer
 
     def post(self, request, order_id):
+        return self.idempotent_response(self.pay, request, order_id)
+
+    def pay(self, request, order_id):
         try:
             order = Order.objects.get(id=order_id, user=request.user)
         except Order.DoesNotExist:
@@ -1,5 +1,8 @@
 from rest_framework.exceptions import ValidationError
+from django.db import transaction
+from core.outbox import publish
 
+@transaction.atomic
 def create_payment(user, order, card_data=None):
     if not order.items.exists():
         raise ValidationError("Please select at least one item for payment")
@@ -16,5 +19,6 @@ def create_payment(user, order, card_data=None):
     order.payment_method = "mock"
     order.status = "processing"
     order.save()
+    publish("payment.completed", result)
 
     return result
\ No newline at end of file
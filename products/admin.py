@@ -3,7 +3,7 @@ from .models import Product
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('id', 'title', 'slug', 'price', 'stock', 'is_active', 'category')
+    list_display = ('id', 'title', 'slug', 'price', 'stock', 'reserved', 'is_active', 'category')
     list_filter = ('category', 'is_active')
     list_editable = ('price', 'stock', 'is_active')
     prepopulated_fields = {'slug': ('title',)}
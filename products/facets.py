@@ -0,0 +1,62 @@
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+MAX_PRICE_BUCKETS = 20
+
+
+def parse_price_edges(value):
+    if not value:
+        return [Decimal(edge) for edge in getattr(settings, 'PRODUCT_FACET_PRICE_EDGES', (0, 50, 100, 250, 500, 1000))]
+
+    try:
+        edges = [Decimal(edge) for edge in value.split(',')]
+    except InvalidOperation:
+        edges = None
+    if edges is None or not all(edge.is_finite() for edge in edges):
+        raise ValidationError({'price_buckets': 'Bucket edges must be numbers, e.g. 0,50,100'})
+
+    if len(edges) > MAX_PRICE_BUCKETS or edges != sorted(set(edges)):
+        raise ValidationError({'price_buckets': f'Provide up to {MAX_PRICE_BUCKETS} ascending, distinct bucket edges'})
+    return edges
+
+
+def get_product_facets(queryset, edges):
+    """
+    Category and price-bucket counts for a filtered product queryset, computed
+    with one GROUP BY category query carrying a conditional Count per bucket.
+    """
+    buckets = [
+        (lower, edges[i + 1] if i + 1 < len(edges) else None)
+        for i, lower in enumerate(edges)
+    ]
+    bucket_counts = {
+        f'bucket_{i}': Count('id', filter=Q(price__gte=lower) & (Q(price__lt=upper) if upper is not None else Q()))
+        for i, (lower, upper) in enumerate(buckets)
+    }
+
+    rows = (
+        queryset.order_by()
+        .values('category__slug', 'category__title')
+        .annotate(count=Count('id'), **bucket_counts)
+        .order_by('category__title')
+    )
+
+    categories = []
+    totals = [0] * len(buckets)
+    count = 0
+    for row in rows:
+        count += row['count']
+        categories.append({'slug': row['category__slug'], 'title': row['category__title'], 'count': row['count']})
+        for i in range(len(buckets)):
+            totals[i] += row[f'bucket_{i}']
+
+    return {
+        'count': count,
+        'categories': categories,
+        'price': [
+            {'min': str(lower), 'max': str(upper) if upper is not None else None, 'count': totals[i]}
+            for i, (lower, upper) in enumerate(buckets)
+        ],
+    }
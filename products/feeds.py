@@ -0,0 +1,183 @@
+import re
+import time
+from decimal import Decimal, InvalidOperation
+from dataclasses import dataclass, field
+from itertools import islice
+from django.db import connections, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from core.cache import bump_generation_on_commit
+from . import validations
+from .models import Product
+
+SLUG_RE = re.compile(r'^[-a-zA-Z0-9_]+\Z')
+CENTS = Decimal('0.01')
+
+
+def parse_delta(record):
+    """
+    Validates one feed record by hand: running a DRF serializer per row cost
+    more than the whole database round trip.
+    """
+    errors = {}
+    data = {}
+
+    slug = record.get('slug')
+    if not isinstance(slug, str) or not SLUG_RE.match(slug):
+        errors['slug'] = ['Enter a valid slug']
+    data['slug'] = slug
+
+    if record.get('stock') not in (None, ''):
+        try:
+            data['stock'] = int(record['stock'])
+            if data['stock'] < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors['stock'] = ['Stock must be a non-negative integer']
+
+    if record.get('price') not in (None, ''):
+        try:
+            price = Decimal(str(record['price']))
+            if price != price.quantize(CENTS) or price.adjusted() >= 8:
+                raise InvalidOperation
+            data['price'] = validations.validate_price(price.quantize(CENTS))
+        except (InvalidOperation, ValueError):
+            errors['price'] = ['Enter a valid price with at most 2 decimal places']
+        except serializers.ValidationError as e:
+            errors['price'] = e.detail
+
+    if not errors and 'stock' not in data and 'price' not in data:
+        errors['non_field_errors'] = ['Provide stock and/or price']
+    if errors:
+        raise serializers.ValidationError(errors)
+    return data
+
+
+@dataclass
+class FeedReport:
+    received: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    # Records superseded by a later record for the same slug in the batch.
+    duplicates: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+    max_errors: int = 100
+    elapsed: float = 0.0
+    lock_time: float = 0.0
+    max_lock_time: float = 0.0
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    @property
+    def rows_per_second(self):
+        return self.received / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'received': self.received,
+            'changed': self.changed,
+            'unchanged': self.unchanged,
+            'duplicates': self.duplicates,
+            'failed': self.failed,
+            'errors': self.errors,
+            'elapsed_ms': round(self.elapsed * 1000, 1),
+            'lock_ms': round(self.lock_time * 1000, 1),
+            'max_lock_ms': round(self.max_lock_time * 1000, 1),
+            'rows_per_second': round(self.rows_per_second),
+        }
+
+
+def write_changes(changes, now):
+    """
+    Writes (pk, stock, price) tuples with one parameterised UPDATE through
+    executemany(); bulk_update() builds a CASE WHEN per column and row, which
+    measured ~80x slower on the same batches.
+    """
+    connection = connections[Product.objects.db]
+    meta = Product._meta
+    price_field = meta.get_field('price')
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} = %s, {} = %s, {} = %s WHERE {} = %s'.format(
+        quote(meta.db_table),
+        quote(meta.get_field('stock').column),
+        quote(price_field.column),
+        quote(meta.get_field('updated_at').column),
+        quote(meta.pk.column),
+    )
+    updated_at = meta.get_field('updated_at').get_db_prep_save(now, connection)
+    params = [
+        (stock, price_field.get_db_prep_save(price, connection), updated_at, pk)
+        for pk, stock, price in changes
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def apply_batch(batch, report):
+    deltas = {}
+    for line, record in batch:
+        report.received += 1
+        if isinstance(record, Exception):
+            report.add_error(line, {'non_field_errors': [str(record)]})
+            continue
+        try:
+            data = parse_delta(record)
+        except serializers.ValidationError as e:
+            report.add_error(line, e.detail)
+            continue
+        # Later records for the same slug win, like they would if applied one by one.
+        if data['slug'] in deltas:
+            report.duplicates += 1
+        deltas[data['slug']] = (line, data)
+
+    if not deltas:
+        return
+
+    # The transaction only spans the diff and the write, which keeps row
+    # locks short on databases that honour select_for_update.
+    started = time.perf_counter()
+    with transaction.atomic():
+        current = (
+            Product.objects.select_for_update()
+            .filter(slug__in=deltas.keys())
+            .values_list('id', 'slug', 'stock', 'price')
+        )
+        changes = []
+        for pk, slug, stock, price in current:
+            _, delta = deltas.pop(slug)
+            new_stock = delta.get('stock', stock)
+            new_price = delta.get('price', price)
+            if new_stock == stock and new_price == price:
+                report.unchanged += 1
+            else:
+                changes.append((pk, new_stock, new_price))
+
+        if changes:
+            write_changes(changes, timezone.now())
+            bump_generation_on_commit('products.Product')
+    lock_time = time.perf_counter() - started
+
+    report.changed += len(changes)
+    for line, _ in deltas.values():
+        report.add_error(line, {'slug': ['Product not found']})
+    report.lock_time += lock_time
+    report.max_lock_time = max(report.max_lock_time, lock_time)
+
+
+def apply_delta_feed(records, batch_size=1000, max_errors=100):
+    report = FeedReport(max_errors=max_errors)
+    records = iter(records)
+
+    started = time.perf_counter()
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        apply_batch(batch, report)
+    report.elapsed = time.perf_counter() - started
+
+    return report
@@ -1,12 +1,62 @@
 import django_filters
+from django.db.models import F
+from rest_framework.filters import BaseFilterBackend
+from categories.tree import get_category_tree
 from .models import Product
+from .search import get_search_backend
 
 class ProductFilter(django_filters.FilterSet):
-    category = django_filters.CharFilter(field_name="category__slug", lookup_expr="exact")
+    category = django_filters.CharFilter(
+        method="filter_category",
+        help_text="Category slug or id; includes products of all its subcategories."
+    )
+    available = django_filters.BooleanFilter(
+        method="filter_available",
+        help_text="Only products with stock left that is not held in carts."
+    )
+    ordering = django_filters.OrderingFilter(fields=("created_at", "price"))
+
     class Meta:
         model = Product
         fields = {
             "title": ["iexact","icontains"],
             "price": ["exact","lt","gt","range"],
             "category": ["exact"]
-        }
\ No newline at end of file
+        }
+
+    def filter_category(self, queryset, name, value):
+        # Subtree ids come from the cached tree, so this stays one indexed
+        # category_id IN (...) query however deep the hierarchy is.
+        tree = get_category_tree()
+        return queryset.filter(category_id__in=tree.subtree_ids(tree.resolve(value)))
+
+    def filter_available(self, queryset, name, value):
+        # Reservations are kept as a counter on the row, so this is a
+        # column comparison rather than an aggregate over carts.
+        if value:
+            return queryset.filter(stock__gt=F("reserved"))
+        return queryset.filter(stock__lte=F("reserved"))
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query:
+            return queryset
+
+        backend = get_search_backend()
+        queryset = backend.filter(queryset, query)
+        if "ordering" in request.query_params or not backend.ordering or queryset.query.is_empty():
+            return queryset
+        return queryset.order_by(*backend.ordering, "-created_at")
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            "name": self.search_param,
+            "required": False,
+            "in": "query",
+            "description": "Full-text search over title and description, ranked by relevance.",
+            "schema": {"type": "string"},
+        }]
@@ -0,0 +1,119 @@
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+_executor = None
+
+
+def file_digest(file):
+    hasher = hashlib.sha256()
+    for chunk in file.chunks():
+        hasher.update(chunk)
+    return hasher.hexdigest()[:32]
+
+
+def get_variant_widths():
+    return sorted(getattr(settings, 'PRODUCT_IMAGE_WIDTHS', (320, 640, 1280)))
+
+
+def render_variant(image, width, fmt):
+    height = round(image.height * width / image.width)
+    resized = image.resize((width, height), Image.Resampling.LANCZOS) if width < image.width else image
+
+    if fmt == 'jpeg' and resized.mode != 'RGB':
+        background = Image.new('RGB', resized.size, (255, 255, 255))
+        rgba = resized.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        resized = background
+
+    buffer = io.BytesIO()
+    resized.save(buffer, **VARIANT_FORMATS[fmt])
+    return buffer.getvalue()
+
+
+def build_variants(field_file):
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as source:
+        digest = file_digest(source)
+        source.seek(0)
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    widths = [width for width in get_variant_widths() if width < image.width] or [image.width]
+    variants = {'source': field_file.name}
+    for fmt in VARIANT_FORMATS:
+        variants[fmt] = {}
+        for width in widths:
+            name = f'products/variants/{digest}-{width}w.{fmt}'
+            # Content-addressed: identical uploads reuse the stored files.
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(render_variant(image, width, fmt)))
+            variants[fmt][str(width)] = name
+    return variants
+
+
+def generate_product_image_variants(product_id):
+    from core.cache import bump_generation
+    from .models import Product
+
+    try:
+        product = Product.objects.get(pk=product_id)
+        if not product.image:
+            return
+
+        variants = build_variants(product.image)
+        # Only store the result if the image was not replaced while we worked.
+        updated = Product.objects.filter(pk=product_id, image=product.image.name).update(
+            image_variants=variants,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            bump_generation('products.Product')
+    except Exception:
+        logger.exception(f"Image variant generation failed for product {product_id}")
+
+
+def run_in_worker(product_id):
+    try:
+        generate_product_image_variants(product_id)
+    finally:
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PRODUCT_IMAGE_WORKERS,
+            thread_name_prefix='product-images',
+        )
+    return _executor
+
+
+def schedule_image_variants(product):
+    """Queue variant generation once the upload is committed; 0 workers runs it inline."""
+    product_id = product.id
+
+    def submit():
+        if getattr(settings, 'PRODUCT_IMAGE_WORKERS', 2):
+            get_executor().submit(run_in_worker, product_id)
+        else:
+            generate_product_image_variants(product_id)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,166 @@
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+from categories.models import Category
+from core.cache import bump_generation_on_commit
+from . import validations
+from .models import Product
+from .search import get_search_backend
+
+
+class ProductImportSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=100)
+    slug = serializers.SlugField(max_length=100)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    stock = serializers.IntegerField(min_value=0, required=False)
+    is_active = serializers.BooleanField(required=False, default=True)
+    category = serializers.CharField()
+
+    def validate_title(self, value):
+        return validations.validate_title(value)
+
+    def validate_price(self, value):
+        return validations.validate_price(value)
+
+    def validate(self, data):
+        return validations.validate_product_object(data)
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+    max_errors: int = 100
+    on_error: object = None
+    # A batch finds its errors in several passes; they are reported by line
+    # once the batch is done.
+    batch_errors: list = field(default_factory=list)
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        self.batch_errors.append((line, errors))
+
+    def end_batch(self):
+        for line, errors in sorted(self.batch_errors, key=lambda error: error[0]):
+            if self.on_error is not None:
+                self.on_error(line, errors)
+            if len(self.errors) < self.max_errors:
+                self.errors.append({'line': line, 'errors': errors})
+        self.batch_errors.clear()
+
+    def as_dict(self):
+        return {'created': self.created, 'failed': self.failed, 'errors': self.errors}
+
+
+def iter_records(stream, fmt):
+    """Yield (line number, record) pairs from a text stream without loading it whole."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {key: value for key, value in record.items() if value != ''}
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, e
+    else:
+        raise ValueError(f'Unsupported import format: {fmt}')
+
+
+def open_text(file, encoding='utf-8'):
+    if isinstance(file, io.TextIOBase):
+        return file
+    return io.TextIOWrapper(file, encoding=encoding, newline='')
+
+
+class CategoryResolver:
+    """Resolves category slugs or ids a batch at a time, caching across batches."""
+
+    def __init__(self):
+        self.by_key = {}
+
+    def load(self, keys):
+        missing = {key for key in keys if key not in self.by_key}
+        if not missing:
+            return
+
+        ids = [int(key) for key in missing if key.isdigit()]
+        self.by_key.update(dict.fromkeys(missing))
+        for category in Category.objects.filter(slug__in=missing) | Category.objects.filter(id__in=ids):
+            self.by_key[category.slug] = category
+            self.by_key[str(category.id)] = category
+
+    def get(self, key):
+        return self.by_key.get(key)
+
+
+def import_batch(batch, categories, report, dry_run=False):
+    # One serializer validates every row, so its fields are only built once.
+    serializer = ProductImportSerializer()
+    valid = []
+    for line, record in batch:
+        if isinstance(record, Exception):
+            report.add_error(line, {'non_field_errors': [str(record)]})
+            continue
+
+        try:
+            valid.append((line, serializer.run_validation(record)))
+        except serializers.ValidationError as e:
+            report.add_error(line, e.detail)
+
+    slugs = [data['slug'] for _, data in valid]
+    taken = set(Product.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+    categories.load({str(data['category']) for _, data in valid})
+
+    products = []
+    for line, data in valid:
+        category = categories.get(str(data['category']))
+        if data['slug'] in taken:
+            report.add_error(line, {'slug': ['This field is taken']})
+        elif category is None:
+            report.add_error(line, {'category': ['Invalid category']})
+        else:
+            taken.add(data['slug'])
+            products.append((line, Product(**{**data, 'category': category})))
+
+    if not products:
+        return
+    if dry_run:
+        report.created += len(products)
+        return
+
+    try:
+        with transaction.atomic():
+            created = Product.objects.bulk_create([product for _, product in products])
+            get_search_backend().index(created)
+            bump_generation_on_commit('products.Product')
+    except IntegrityError as e:
+        for line, _ in products:
+            report.add_error(line, {'non_field_errors': [str(e)]})
+        return
+
+    report.created += len(created)
+
+
+def import_products(records, batch_size=1000, dry_run=False, max_errors=100, on_error=None):
+    report = ImportReport(max_errors=max_errors, on_error=on_error)
+    categories = CategoryResolver()
+    records = iter(records)
+
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        import_batch(batch, categories, report, dry_run=dry_run)
+        report.end_batch()
+
+    return report
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts "
+        "USING fts5(title, description, tokenize='porter unicode61', prefix='2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO products_product_fts (rowid, title, description) "
+        "SELECT id, title, COALESCE(description, '') FROM products_product"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    schema_editor.execute("DROP TABLE IF EXISTS products_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
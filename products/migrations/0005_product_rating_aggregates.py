@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:30
+
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import migrations, models
+
+
+def populate_ratings(apps, schema_editor):
+    Comment = apps.get_model('comments', 'Comment')
+    Product = apps.get_model('products', 'Product')
+
+    for product in Product.objects.filter(comments__isnull=False).distinct():
+        ratings = list(Comment.objects.filter(product=product).values_list('rating', flat=True))
+        product.rating_count = len(ratings)
+        product.rating_sum = sum(ratings)
+        product.rating_avg = (Decimal(product.rating_sum) / len(ratings)).quantize(
+            Decimal('0.01'), rounding=ROUND_HALF_UP
+        )
+        product.rating_histogram = {str(star): ratings.count(star) for star in range(1, 6)}
+        product.save(update_fields=['rating_count', 'rating_sum', 'rating_avg', 'rating_histogram'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_image_variants'),
+        ('comments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_histogram',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_ratings, migrations.RunPython.noop),
+    ]
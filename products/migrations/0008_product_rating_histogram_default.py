@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:15
+
+import products.models
+from django.db import migrations, models
+
+
+def fill_empty_histograms(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(rating_histogram={}).update(
+        rating_histogram={str(star): 0 for star in range(1, 6)}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_reserved'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='rating_histogram',
+            field=models.JSONField(blank=True, default=products.models.empty_rating_histogram, editable=False),
+        ),
+        migrations.RunPython(fill_empty_histograms, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,61 @@
 from django.db import models
 from categories.models import Category
 
+RATING_STARS = ('1', '2', '3', '4', '5')
+
+
+def empty_rating_histogram():
+    return dict.fromkeys(RATING_STARS, 0)
+
+
 class Product(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField(null=True, blank=True)
     slug = models.SlugField(max_length=100, unique=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
+    # Units held by active cart reservations; see carts.reservations.
+    reserved = models.PositiveIntegerField(default=0, editable=False)
     is_active = models.BooleanField(default=True)
     category = models.ForeignKey(Category, on_delete=models.RESTRICT, related_name='products')
     image = models.ImageField(upload_to='products/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_histogram = models.JSONField(default=empty_rating_histogram, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'price'], condition=models.Q(is_active=True),
+                         name='product_active_cat_price_idx'),
+            models.Index(fields=['price'], condition=models.Q(is_active=True),
+                         name='product_active_price_idx'),
+            models.Index(fields=['created_at'], condition=models.Q(is_active=True),
+                         name='product_active_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
+
+    @property
+    def available_stock(self):
+        return max(self.stock - self.reserved, 0)
+
+
+class ProductRelation(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='relations')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_from')
+    score = models.PositiveIntegerField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('product', 'related')
+        indexes = [
+            models.Index(fields=['product', 'rank'], name='product_relation_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} ({self.score})"
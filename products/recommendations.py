@@ -0,0 +1,98 @@
+import heapq
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+from django.conf import settings
+from django.db import transaction
+from core.cache import bump_generation_on_commit
+from .models import ProductRelation
+
+MAX_BASKET_SIZE = 50
+
+
+def iter_baskets(order_ids=None, chunk_size=5000):
+    """Stream distinct product ids per order, ordered by order id."""
+    from orders.models import OrderItem
+
+    items = OrderItem.objects.filter(product__isnull=False)
+    if order_ids is not None:
+        items = items.filter(order_id__in=order_ids)
+    rows = items.order_by('order_id').values_list('order_id', 'product_id').iterator(chunk_size=chunk_size)
+
+    for _, group in groupby(rows, key=lambda row: row[0]):
+        yield sorted({product_id for _, product_id in group})
+
+
+def count_cooccurrences(baskets, products=None):
+    """
+    Sparse co-occurrence matrix as {product: Counter(related: orders)}.
+    `products` restricts which rows are kept (used by incremental builds).
+    """
+    matrix = defaultdict(Counter)
+    for basket in baskets:
+        # Huge baskets (wholesale orders) add O(n^2) noise and little signal.
+        if len(basket) < 2 or len(basket) > MAX_BASKET_SIZE:
+            continue
+        for a, b in combinations(basket, 2):
+            if products is None or a in products:
+                matrix[a][b] += 1
+            if products is None or b in products:
+                matrix[b][a] += 1
+    return matrix
+
+
+def top_k(matrix, k, min_score=1):
+    for product_id, counts in matrix.items():
+        best = heapq.nlargest(
+            k,
+            ((score, -related_id) for related_id, score in counts.items() if score >= min_score)
+        )
+        yield product_id, [(-neg_id, score) for score, neg_id in best]
+
+
+@transaction.atomic
+def store_relations(rows, product_ids=None, batch_size=1000):
+    existing = ProductRelation.objects.all()
+    if product_ids is not None:
+        existing = existing.filter(product_id__in=product_ids)
+    existing.delete()
+
+    batch = []
+    for product_id, related in rows:
+        for rank, (related_id, score) in enumerate(related):
+            batch.append(ProductRelation(product_id=product_id, related_id=related_id, score=score, rank=rank))
+        if len(batch) >= batch_size:
+            ProductRelation.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ProductRelation.objects.bulk_create(batch)
+
+    bump_generation_on_commit('products.Product')
+
+
+def build_related_products(k=None, min_score=1, since=None):
+    """
+    Rebuild the "frequently bought together" table. With `since`, only the
+    products ordered after that moment are recomputed, from all their orders.
+    """
+    from orders.models import Order, OrderItem
+
+    k = k or getattr(settings, 'PRODUCT_RELATED_TOP_K', 10)
+    if since is None:
+        matrix = count_cooccurrences(iter_baskets())
+        rows = list(top_k(matrix, k, min_score))
+        store_relations(rows)
+        return len(rows)
+
+    products = set(
+        OrderItem.objects.filter(order__created_at__gte=since, product__isnull=False)
+        .values_list('product_id', flat=True)
+        .distinct()
+    )
+    if not products:
+        return 0
+
+    order_ids = Order.objects.filter(items__product_id__in=products).values('id')
+    matrix = count_cooccurrences(iter_baskets(order_ids=order_ids), products=products)
+    rows = list(top_k(matrix, k, min_score))
+    store_relations(rows, product_ids=products)
+    return len(products)
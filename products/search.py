@@ -0,0 +1,118 @@
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from .models import Product
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+class BaseSearchBackend:
+    # Applied by ProductSearchFilter unless the client picked an ordering.
+    ordering = ()
+
+    def filter(self, queryset, query):
+        """Narrow `queryset` to products matching `query`, in the database."""
+        raise NotImplementedError
+
+    def index(self, products):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Unindexed fallback for databases without a full-text engine."""
+
+    def filter(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(description__icontains=term)
+        return queryset.filter(condition)
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """
+    Inverted index in an FTS5 virtual table (see migration 0003), with
+    porter stemming, prefix indexes and bm25 ranking that favours titles.
+    The index is joined into the product query, so other filters, counts and
+    pagination see every match.
+    """
+    table = 'products_product_fts'
+    ordering = ('search_rank',)
+    title_weight = 10.0
+    description_weight = 1.0
+
+    def build_match(self, query):
+        return ' '.join(f'"{term}"*' for term in tokenize(query))
+
+    def filter(self, queryset, query):
+        match = self.build_match(query)
+        if not match:
+            return queryset.none()
+
+        # extra() joins the virtual table, which has no model; bm25() is
+        # lower for better matches.
+        return queryset.extra(
+            tables=[self.table],
+            where=[f'{self.table}.rowid = {Product._meta.db_table}.id', f'{self.table} MATCH %s'],
+            params=[match],
+        ).alias(search_rank=RawSQL(
+            f'bm25({self.table}, %s, %s)', (self.title_weight, self.description_weight)
+        ))
+
+    def index(self, products):
+        rows = [(p.id, p.title, p.description or '') for p in products]
+        if not rows:
+            return
+
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, description) VALUES (%s, %s, %s)',
+                rows
+            )
+
+    def remove(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, description) '
+                f'SELECT id, title, COALESCE(description, \'\') FROM {Product._meta.db_table}'
+            )
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+
+
+VENDOR_BACKENDS = {
+    'sqlite': 'products.search.SQLiteFTS5Backend',
+}
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None) or VENDOR_BACKENDS.get(
+            connection.vendor, 'products.search.DatabaseSearchBackend'
+        )
+        _backend = import_string(backend_path)()
+    return _backend
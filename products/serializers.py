@@ -1,7 +1,12 @@
+from django.db.models import Manager, QuerySet
+from django.db.models.query import ModelIterable
 from rest_framework import serializers
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from .models import Product
 from . import validations
 from categories.models import Category
+from core.fieldsets import SparseFieldsetMixin
 
 class ProductWriteSerializer(serializers.ModelSerializer):
     image = serializers.ImageField(required=False, allow_null=True)
@@ -37,17 +42,121 @@ class ProductWriteSerializer(serializers.ModelSerializer):
     def validate(self, data):
         return validations.validate_product_object(data)
 
+class ProductFileUploadSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)
+    batch_size = serializers.IntegerField(min_value=1, max_value=10000, default=1000)
+
+    def validate(self, data):
+        if 'format' not in data:
+            ext = data['file'].name.rsplit('.', 1)[-1].lower()
+            if ext not in ('csv', 'jsonl'):
+                raise serializers.ValidationError('Could not detect the file format, please provide one.')
+            data['format'] = ext
+        return data
+
+class ProductImportUploadSerializer(ProductFileUploadSerializer):
+    dry_run = serializers.BooleanField(default=False)
+
 class ProductSimpleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = ['id', 'title']
 
-class ProductReadSerializer(serializers.ModelSerializer):
+@extend_schema_field(OpenApiTypes.OBJECT)
+class ImageVariantsField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        storage = Product._meta.get_field('image').storage
+        request = self.context.get('request')
+        ret = {}
+        for fmt, widths in value.items():
+            if fmt == 'source':
+                continue
+            ret[fmt] = {}
+            for width, name in widths.items():
+                url = storage.url(name)
+                ret[fmt][width] = request.build_absolute_uri(url) if request is not None else url
+        return ret
+
+
+class ProductReadListSerializer(serializers.ListSerializer):
+    """
+    Builds the child's output straight from `values()` rows: one joined query
+    and no per-row serializer machinery. Each value still goes through the
+    field's own to_representation, so the JSON matches the child exactly.
+    """
+    extra_values = ('id', 'created_at')
+
+    def get_converters(self):
+        converters = {}
+        for name, field in self.child.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.FileField):
+                converters[name] = (field.source.replace('.', '__'), self.file_converter(field))
+            elif isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer)):
+                return None
+            else:
+                converters[name] = (field.source.replace('.', '__'), field.to_representation)
+        return converters
+
+    def file_converter(self, field):
+        storage = Product._meta.get_field(field.source).storage
+        request = self.context.get('request')
+
+        def convert(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+
+    def get_values_fields(self):
+        converters = self.get_converters() or {}
+        # Cursor pagination reads its ordering keys off the rows, whatever
+        # ?fields= selected.
+        ordering = getattr(self.context.get('view'), 'cursor_ordering_fields', ())
+        return tuple(dict.fromkeys(
+            [lookup for lookup, _ in converters.values()] + list(self.extra_values) + list(ordering)
+        ))
+
+    def to_representation(self, data):
+        converters = self.get_converters()
+        if converters is None:
+            return super().to_representation(data)
+
+        if isinstance(data, Manager):
+            data = data.all()
+        if isinstance(data, QuerySet) and data._iterable_class is ModelIterable:
+            data = data.values(*self.get_values_fields())
+
+        items = converters.items()
+        ret = []
+        for row in data:
+            if not isinstance(row, dict):
+                ret.append(self.child.to_representation(row))
+                continue
+            ret.append({
+                name: None if row[lookup] is None else convert(row[lookup])
+                for name, (lookup, convert) in items
+            })
+        return ret
+
+
+class ProductReadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = serializers.CharField(
         source='category.title',
         read_only=True
     )
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Product
-        fields = ('title', 'price', 'image', 'category')
\ No newline at end of file
+        fields = ('title', 'price', 'image', 'image_variants', 'category',
+                  'rating_avg', 'rating_count', 'rating_histogram')
+        list_serializer_class = ProductReadListSerializer
\ No newline at end of file
@@ -1,6 +1,9 @@
 from rest_framework.exceptions import ValidationError, NotFound
 from .models import Product
 from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from core.cache import bump_generation_on_commit
 
 def check_product_stock(product, quantity):
     if quantity <= 0:
@@ -11,10 +14,30 @@ def check_product_stock(product, quantity):
             f'Only {product.stock} item(s) left in stock.'
         )
 
-def decrease_product_stock(product, quantity):
-    with transaction.atomic():
-        product.stock -= quantity
-        product.save(update_fields=['stock'])
+@transaction.atomic
+def take_stock(quantities):
+    """
+    Decrease stock for {product_id: quantity} with one conditional UPDATE that
+    only touches rows still holding the units apart from other carts' holds,
+    so concurrent checkouts cannot oversell. If any product falls short,
+    nothing is taken.
+    """
+    amount = Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+    updated = Product.objects.filter(pk__in=quantities, stock__gte=F('reserved') + amount).update(
+        stock=F('stock') - amount,
+        updated_at=timezone.now(),
+    )
+    if updated != len(quantities):
+        for product in Product.objects.filter(pk__in=quantities).only('stock', 'reserved').order_by('pk'):
+            if product.available_stock < quantities[product.pk]:
+                raise ValidationError(f'Only {product.available_stock} item(s) left in stock.')
+        raise NotFound('A product in your cart was not found.')
+    # The UPDATE skips post_save, which is what normally expires cached pages.
+    bump_generation_on_commit('products.Product')
+
 
 def get_product_or_404(product_id):
     try:
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Product
+from .search import get_search_backend
+from .images import schedule_image_variants
+from core.cache import bump_generation_on_commit
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    get_search_backend().index([instance])
+    bump_generation_on_commit('products.Product')
+
+    if instance.image and instance.image_variants.get('source') != instance.image.name:
+        schedule_image_variants(instance)
+    elif not instance.image and instance.image_variants:
+        Product.objects.filter(pk=instance.pk).update(image_variants={})
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_index(sender, instance, **kwargs):
+    get_search_backend().remove([instance.id])
+    bump_generation_on_commit('products.Product')
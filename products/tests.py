@@ -1,3 +1,254 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from categories.models import Category
+from . import search
+from .feeds import apply_delta_feed
+from .models import Product, ProductRelation
+from .search import get_search_backend
+from .serializers import ProductReadSerializer
 
-# Create your tests here.
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(title='Shoes', slug='shoes')
+
+    def create_products(self, count, **kwargs):
+        products = Product.objects.bulk_create([
+            Product(title=f'Running shoe {i}', slug=f'running-shoe-{i}', price=Decimal(10 + i % 50),
+                    stock=5, category=self.category, **kwargs)
+            for i in range(count)
+        ])
+        get_search_backend().index(products)
+        return products
+
+    def test_every_match_is_counted_and_paginated(self):
+        self.create_products(1100)
+        response = self.client.get('/api/products/', {'search': 'running', 'page_size': 100, 'page': 11})
+        self.assertEqual(response.data['count'], 1100)
+        self.assertEqual(len(response.data['results']), 100)
+
+    def test_search_combines_with_filters_and_ranks_titles_first(self):
+        self.create_products(30)
+        Product.objects.create(
+            title='Trail sandal', slug='trail-sandal', description='Not for running',
+            price=Decimal('12.00'), stock=5, category=self.category,
+        )
+        response = self.client.get('/api/products/', {'search': 'running', 'price__lt': 13})
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(response.data['results'][-1]['title'], 'Trail sandal')
+
+    def test_backend_follows_database_vendor(self):
+        with override_settings(PRODUCT_SEARCH_BACKEND=None), mock.patch.object(search, '_backend', None):
+            with mock.patch.object(search.connection, 'vendor', 'postgresql'):
+                self.assertIsInstance(search.get_search_backend(), search.DatabaseSearchBackend)
+        with override_settings(PRODUCT_SEARCH_BACKEND=None), mock.patch.object(search, '_backend', None):
+            self.assertIsInstance(search.get_search_backend(), search.SQLiteFTS5Backend)
+
+    def test_database_backend_matches_every_term(self):
+        self.create_products(3)
+        queryset = search.DatabaseSearchBackend().filter(Product.objects.all(), 'shoe 1')
+        self.assertEqual(list(queryset.values_list('title', flat=True)), ['Running shoe 1'])
+
+
+class RelatedProductsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        self.shoe, self.sock, self.lace = Product.objects.bulk_create([
+            Product(title=title, slug=title.lower(), price=Decimal('10.00'), stock=5, category=category)
+            for title in ('Shoe', 'Sock', 'Lace')
+        ])
+        ProductRelation.objects.bulk_create([
+            ProductRelation(product=self.shoe, related=self.lace, score=3, rank=1),
+            ProductRelation(product=self.shoe, related=self.sock, score=5, rank=0),
+        ])
+
+    def test_related_products_by_rank(self):
+        response = self.client.get(f'/api/products/{self.shoe.pk}/related/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['title'] for row in response.data], ['Sock', 'Lace'])
+
+    def test_unknown_malformed_and_inactive_products_are_not_found(self):
+        Product.objects.filter(pk=self.sock.pk).update(is_active=False)
+        for pk in (999999, 'abc', self.sock.pk):
+            self.assertEqual(self.client.get(f'/api/products/{pk}/related/').status_code, 404)
+
+
+class StockFeedTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        Product.objects.bulk_create([
+            Product(title=title, slug=title.lower(), price=Decimal('10.00'), stock=5, category=category)
+            for title in ('Shoe', 'Sock')
+        ])
+
+    def test_report_matches_what_was_written(self):
+        records = enumerate([
+            {'slug': 'shoe', 'stock': 1},
+            {'slug': 'shoe', 'stock': 2},
+            {'slug': 'shoe', 'stock': 3},
+            {'slug': 'sock', 'stock': 5},
+            {'slug': 'missing', 'stock': 1},
+            {'slug': 'sock', 'stock': -1},
+        ], start=1)
+        report = apply_delta_feed(records).as_dict()
+
+        self.assertEqual(
+            {key: report[key] for key in ('received', 'changed', 'unchanged', 'duplicates', 'failed')},
+            {'received': 6, 'changed': 1, 'unchanged': 1, 'duplicates': 2, 'failed': 2},
+        )
+        self.assertEqual(Product.objects.get(slug='shoe').stock, 3)
+
+
+class SparseFieldsetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(title='Shoes', slug='shoes')
+        Product.objects.bulk_create([
+            Product(title=f'Shoe {i}', slug=f'shoe-{i}', price=Decimal(10 + i), stock=5, category=self.category)
+            for i in range(5)
+        ])
+
+    def walk(self, url, params):
+        titles, response = [], self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([set(row) for row in response.data['results']], [{'title'}] * len(response.data['results']))
+            titles += [row['title'] for row in response.data['results']]
+            if not response.data['next']:
+                return titles
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_pages_when_fields_omit_the_ordering_column(self):
+        params = {'pagination': 'cursor', 'ordering': 'price', 'fields': 'title', 'page_size': 2}
+        expected = [f'Shoe {i}' for i in range(5)]
+        self.assertEqual(self.walk('/api/products/', params), expected)
+        self.assertEqual(self.walk(f'/api/categories/{self.category.pk}/products/', params), expected)
+
+
+class ProductFacetsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        shoes = Category.objects.create(title='Shoes', slug='shoes')
+        socks = Category.objects.create(title='Socks', slug='socks')
+        Product.objects.bulk_create([
+            Product(title=title, slug=title.lower(), price=Decimal(price), stock=5, category=category)
+            for title, price, category in (
+                ('Boot', '120.00', shoes), ('Sneaker', '60.00', shoes), ('Wool', '8.00', socks),
+            )
+        ])
+
+    def test_category_and_price_bucket_counts(self):
+        response = self.client.get('/api/products/facets/', {'price_buckets': '0,50,100'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            [(row['slug'], row['count']) for row in response.data['categories']],
+            [('shoes', 2), ('socks', 1)],
+        )
+        self.assertEqual(
+            response.data['price'],
+            [{'min': '0', 'max': '50', 'count': 1}, {'min': '50', 'max': '100', 'count': 1},
+             {'min': '100', 'max': None, 'count': 1}],
+        )
+
+    def test_counts_follow_filters(self):
+        response = self.client.get('/api/products/facets/', {'category': 'shoes', 'price_buckets': '0,100'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([row['count'] for row in response.data['price']], [1, 1])
+
+    def test_invalid_edges_are_rejected(self):
+        for value in ('0,abc', '50,10', '0,0', 'NaN', '0,Infinity', '-inf,10', 'sNaN', ','.join(map(str, range(21)))):
+            response = self.client.get('/api/products/facets/', {'price_buckets': value})
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn('price_buckets', response.data['error']['message'])
+
+
+class ProductListFastPathTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(title='Shoes', slug='shoes')
+        Product.objects.bulk_create([
+            Product(title='Boot', slug='boot', price=Decimal('120.50'), stock=5, category=category,
+                    image='products/boot.jpg',
+                    image_variants={'source': 'abc', 'webp': {'320': 'products/variants/boot-320.webp'}},
+                    rating_avg=Decimal('4.50'), rating_count=2, rating_histogram={'4': 1, '5': 1}),
+            Product(title='Sock', slug='sock', price=Decimal('5.00'), stock=5, category=category),
+        ])
+
+    def test_list_rows_match_the_model_serializer(self):
+        for params in ({}, {'fields': 'title,image,category'}, {'omit': 'image_variants,rating_histogram'}):
+            response = self.client.get('/api/products/', params)
+            listed = {row['title']: row for row in response.data['results']}
+            self.assertEqual(len(listed), 2)
+
+            for product in Product.objects.select_related('category'):
+                # Detail responses serialize model instances.
+                detail = self.client.get(f'/api/products/{product.pk}/', params).data
+                self.assertEqual(listed[product.title], detail)
+                if not params:
+                    request = Request(APIRequestFactory().get('/api/products/'))
+                    expected = ProductReadSerializer(product, context={'request': request}).data
+                    self.assertEqual(listed[product.title], expected)
+
+        boot = listed['Boot']
+        self.assertEqual(boot['image'], 'http://testserver/media/products/boot.jpg')
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', password='pw', is_staff=True))
+        self.category = Category.objects.create(title='Shoes', slug='shoes')
+        Product.objects.create(title='Existing', slug='existing', price=Decimal('10.00'), stock=5, category=self.category)
+
+    def upload(self, name, content, **data):
+        return self.client.post('/api/products/import/', {
+            'file': SimpleUploadedFile(name, content.encode()), **data,
+        }, format='multipart')
+
+    def test_partial_failures_are_reported_by_line(self):
+        response = self.upload('products.csv', '\n'.join([
+            'title,slug,price,stock,category',
+            'Trail boot,trail-boot,10.00,5,shoes',
+            'Woollen sock,existing,5.00,5,shoes',
+            'Long lace,long-lace,-1,5,shoes',
+            'Leather belt,leather-belt,3.00,1,missing',
+            'Other boot,trail-boot,12.00,5,shoes',
+            f'Summer sandal,sandal,20.00,5,{self.category.pk}',
+        ]))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 4)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 4, 5, 6])
+        self.assertEqual(response.data['errors'][0]['errors'], {'slug': ['This field is taken']})
+        self.assertIn('price', response.data['errors'][1]['errors'])
+        self.assertEqual(set(Product.objects.values_list('slug', flat=True)), {'existing', 'trail-boot', 'sandal'})
+
+    def test_errors_stay_in_line_order_across_batches(self):
+        lines = [
+            json.dumps({'title': 'Trail boot', 'slug': 'existing', 'price': '10.00', 'stock': 5, 'category': 'shoes'}),
+            '{not json',
+            json.dumps({'title': 'Summer sandal', 'slug': 'sandal', 'price': '20.00', 'stock': 5, 'category': 'shoes'}),
+            json.dumps({'title': 'Soft slipper', 'slug': 'slipper', 'price': '8.00', 'stock': 5, 'category': 'missing'}),
+            json.dumps({'title': 'Wooden clog', 'slug': 'clog', 'stock': 5, 'category': 'shoes'}),
+        ]
+        response = self.upload('products.jsonl', '\n'.join(lines), batch_size=3, dry_run=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['line'] for error in response.data['errors']], [1, 2, 4, 5])
+        self.assertFalse(Product.objects.filter(slug='sandal').exists())
@@ -1,23 +1,42 @@
+from functools import partial
 from rest_framework.viewsets import ModelViewSet
+from rest_framework.generics import get_object_or_404
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework import status
 from django_filters.rest_framework import DjangoFilterBackend
-from drf_spectacular.utils import extend_schema_view, extend_schema
+from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 from .models import Product
-from .serializers import ProductReadSerializer, ProductWriteSerializer
-from .filters import ProductFilter
+from .serializers import (
+    ProductReadSerializer, ProductWriteSerializer, ProductImportUploadSerializer, ProductFileUploadSerializer
+)
+from .imports import import_products, iter_records, open_text
+from .feeds import apply_delta_feed
+from .facets import get_product_facets, parse_price_edges
+from .filters import ProductFilter, ProductSearchFilter
 from core.permissions import IsAdminOrReadOnly
+from core.pagination import CursorOrPageNumberPagination
+from core.cache import CachedReadMixin
+from core.conditional import ConditionalGetMixin
+from core.fieldsets import SparseQuerysetMixin, SPARSE_FIELDSET_PARAMETERS
 
 
 @extend_schema_view(
     list=extend_schema(
         summary="List Products",
-        description="Returns detailed information for products.",
+        description="Returns detailed information for products. "
+                    "Use ?search= for ranked full-text search over title and description.",
         tags=["Products"],
+        parameters=SPARSE_FIELDSET_PARAMETERS,
     ),
     retrieve=extend_schema(
         summary="Retrieve Product Detail",
         description="Returns detailed information for a specific product by ID.",
         tags=["Products"],
+        parameters=SPARSE_FIELDSET_PARAMETERS,
     ),
     create=extend_schema(
         summary="Create Product (Admin)",
@@ -39,18 +58,122 @@ from core.permissions import IsAdminOrReadOnly
         description="Deletes a product. Only accessible to admin users.",
         tags=["Products"],
     ),
+    bulk_import=extend_schema(
+        summary="Bulk Import Products (Admin)",
+        description="Streams a CSV or JSONL upload into the catalog in batches. "
+                    "Slugs and categories are validated per batch and rows are inserted with bulk_create. "
+                    "Returns the created/failed counts and the first row errors. Only accessible to admin users.",
+        tags=["Products"],
+        responses={200: OpenApiTypes.OBJECT, 201: OpenApiTypes.OBJECT},
+    ),
+    facets=extend_schema(
+        summary="Product Facet Counts",
+        description="Returns per-category counts and price histogram buckets for the current product filters, "
+                    "computed in a single aggregation query. Accepts the same filters as the product list. "
+                    "Optional ?price_buckets=0,50,100 sets the bucket lower edges.",
+        tags=["Products"],
+        parameters=[OpenApiParameter('price_buckets', OpenApiTypes.STR, description='Comma-separated ascending bucket edges.')],
+        responses={200: OpenApiTypes.OBJECT},
+    ),
+    related=extend_schema(
+        summary="Frequently Bought Together",
+        description="Returns the products most often ordered together with this product, best match first. "
+                    "Read from the precomputed relation table; rebuild it with `manage.py build_related_products`.",
+        tags=["Products"],
+        responses={200: ProductReadSerializer(many=True)},
+    ),
+    stock_feed=extend_schema(
+        summary="Apply Stock/Price Feed (Admin)",
+        description="Applies a CSV or JSONL feed of (slug, stock, price) records. "
+                    "Records are diffed against current values in batches and only changed rows are written. "
+                    "Returns change counts, throughput and time spent holding row locks. Only accessible to admin users.",
+        tags=["Products"],
+        responses={200: OpenApiTypes.OBJECT},
+    ),
 )
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, CachedReadMixin, SparseQuerysetMixin, ModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter]
     filterset_class = ProductFilter
+    pagination_class = CursorOrPageNumberPagination
+    cursor_ordering_fields = ('created_at', 'price')
+    cache_models = ('products.Product', 'categories.Category')
+    cache_actions = ('list', 'retrieve', 'facets', 'related')
+    conditional_actions = ('list', 'retrieve', 'facets')
+    conditional_timestamps = ('updated_at', 'category__updated_at')
 
     def get_queryset(self):
         if self.request.user and self.request.user.is_staff:
-            return Product.objects.all()
-        return Product.objects.filter(is_active=True)
+            queryset = Product.objects.all()
+        else:
+            queryset = Product.objects.filter(is_active=True)
+
+        if self.action in ('list', 'related'):
+            # Rows are fed to ProductReadListSerializer as plain dicts.
+            serializer = self.get_serializer(many=True)
+            return queryset.values(*serializer.get_values_fields())
+        if self.action == 'facets':
+            return queryset
+        if self.action == 'retrieve':
+            return self.get_sparse_queryset(queryset)
+        return queryset.select_related('category')
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'related'):
             return ProductReadSerializer
-        return ProductWriteSerializer
\ No newline at end of file
+        if self.action == 'bulk_import':
+            return ProductImportUploadSerializer
+        if self.action == 'stock_feed':
+            return ProductFileUploadSerializer
+        return ProductWriteSerializer
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        def compute(request):
+            edges = parse_price_edges(request.query_params.get('price_buckets'))
+            queryset = self.filter_queryset(self.get_queryset())
+            return Response(get_product_facets(queryset, edges))
+
+        return self.conditional_response(partial(self.cached_response, compute), request)
+
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        def compute(request):
+            # 404s for unknown, malformed or (for non-staff) inactive products.
+            product_id = get_object_or_404(self.get_queryset().values_list('pk', flat=True), pk=pk)
+            queryset = self.get_queryset().filter(
+                related_from__product_id=product_id
+            ).order_by('related_from__rank')
+            return Response(self.get_serializer(queryset, many=True).data)
+
+        return self.cached_response(compute, request)
+
+    @action(detail=False, methods=['post'], url_path='import',
+            permission_classes=[IsAdminUser], parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        report = import_products(
+            iter_records(open_text(data['file'].file), data['format']),
+            batch_size=data['batch_size'],
+            dry_run=data['dry_run'],
+        )
+        return Response(
+            report.as_dict(),
+            status=status.HTTP_200_OK if data['dry_run'] else status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'], url_path='feed',
+            permission_classes=[IsAdminUser], parser_classes=[MultiPartParser])
+    def stock_feed(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        report = apply_delta_feed(
+            iter_records(open_text(data['file'].file), data['format']),
+            batch_size=data['batch_size'],
+        )
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
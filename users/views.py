@@ -5,6 +5,8 @@ from drf_spectacular.utils import extend_schema_view, extend_schema
 from drf_spectacular.types import OpenApiTypes
 from django.contrib.auth.models import User
 from . import serializers as user_serializers
+from carts.services import CART_TOKEN_HEADER, merge_anonymous_cart
+from carts.views import CART_TOKEN_PARAMETER
 
 class LogoutSerializer(serializers.Serializer):
     pass
@@ -24,8 +26,10 @@ class RegisterView(generics.CreateAPIView):
 @extend_schema_view(
     post=extend_schema(
         summary="User Login",
-        description="Authenticates a user with username and password. Returns user information along with refresh and access JWT tokens.",
+        description="Authenticates a user with username and password. Returns user information along with refresh and access JWT tokens. "
+                    "An anonymous cart sent in X-Cart-Token is merged into the user's cart, capped at the stock available.",
         tags=["Authentication"],
+        parameters=[CART_TOKEN_PARAMETER],
     )
 )
 class LoginView(generics.GenericAPIView):
@@ -36,6 +40,7 @@ class LoginView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
+        merge_anonymous_cart(request.headers.get(CART_TOKEN_HEADER), user)
         return Response({
             'id': user.id,
             'username': user.username,